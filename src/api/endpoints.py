@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile
-from api.models import Overview, ImageQuery
+from api.models import Overview, ImageQuery, ExperimentRequest, NewsQuery
 import os
 
 from utils.logger_config import setup_logger
 from research.default_retrieval import similarity_search, hybrid_search
 from research.image_processing import image_summarize
+from research.experiment_runner import experiment_output_path, run_experiments
+from services.news_ingestion import refresh_news, search_news
 from utils.generate_request_id import RequestIDGenerator
 
 logger = setup_logger(__name__)
@@ -50,21 +52,37 @@ def chat(overview: Overview):
     to the user's question, returning concise responses for easy evaluation.
     """
     if (overview.search_type == 'standard'):
-        results = similarity_search(overview.file_path, overview.chunking_strategy, overview.question)
+        results = similarity_search(overview.file_path, overview.chunking_strategy, overview.question,
+                                    include_figures=overview.include_figures,
+                                    mmr={"fetch_k": overview.fetch_k, "lambda_mult": overview.mmr_lambda}
+                                    if overview.use_mmr else None,
+                                    embedding_provider=overview.embedding_provider or None,
+                                    embedding_model=overview.embedding_model or None,
+                                    reference_answers=overview.reference_answers,
+                                    gold_chunk_ids=overview.gold_chunk_ids)
         simplified_results = [
             {
                 "query": result["query"],
-                "response": result["standard_retrieval"]["response"]
+                "response": result["standard_retrieval"]["response"],
+                "context": result["standard_retrieval"].get("context"),
+                "evaluation": result.get("evaluation")
             }
             for result in results["results"]
         ]
     else: 
-        results = hybrid_search(overview.file_path, overview.chunking_strategy, overview.question)
-        logger.info(results)
+        results = hybrid_search(overview.file_path, overview.chunking_strategy, overview.question,
+                                include_figures=overview.include_figures,
+                                embedding_provider=overview.embedding_provider or None,
+                                embedding_model=overview.embedding_model or None,
+                                reference_answers=overview.reference_answers,
+                                gold_chunk_ids=overview.gold_chunk_ids)
+        logger.debug("Hybrid search results", results=results)
         simplified_results = [
             {
                 "query": result["query"],
-                "response": result["hybrid_search"]["response"]
+                "response": result["hybrid_search"]["response"],
+                "context": result["hybrid_search"].get("context"),
+                "evaluation": result.get("evaluation")
             }
             for result in results["results"]
         ]
@@ -72,6 +90,60 @@ def chat(overview: Overview):
     return {
         "Question": overview.question,
         "results": simplified_results,
+        "evaluation": results["evaluation"],
+    }
+
+@router.post("/experiments", tags=["Rag Research"])
+def experiments(experiment: ExperimentRequest):
+    """
+    Run a batch comparison of chunking strategies, search types and k values.
+
+    Each document is ingested once per chunking strategy, then every question is answered for every
+    combination in parallel. Results are streamed to the requested file in the experiments directory.
+    """
+    if not experiment.documents or not experiment.question:
+        raise HTTPException(status_code=400, detail="At least one document and one question are required.")
+    try:
+        output_path = experiment_output_path(experiment.output_path)
+        summary = run_experiments(
+            experiment.documents,
+            experiment.question,
+            chunking_strategies=experiment.chunking_strategies,
+            search_types=experiment.search_types,
+            k_values=experiment.k_values,
+            reference_answers=experiment.reference_answers,
+            output_path=output_path,
+            max_workers=experiment.max_workers,
+            embedding_provider=experiment.embedding_provider or None,
+            embedding_model=experiment.embedding_model or None,
+            gold_spans=experiment.gold_spans or None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return summary
+
+@router.post("/news/refresh", tags=["News"])
+def news_refresh(rebuild: bool = False):
+    """
+    Fetch the configured news feeds and ingest only new or changed articles into the news index.
+
+    With `rebuild`, a local embedding model of the index is refitted on all of its chunks.
+    """
+    return refresh_news(rebuild=rebuild)
+
+@router.post("/news/search", tags=["News"])
+def news_search(news_query: NewsQuery):
+    """
+    Search the persistent news index.
+    """
+    results = search_news(news_query.query, k=news_query.k)
+    return {
+        "query": news_query.query,
+        "results": [
+            {"text": r["text"], "metadata": r["metadata"], "similarity": float(r["similarity"])}
+            for r in results
+        ],
     }
 
 @router.post("/upload_image", tags=["Image Processing"])
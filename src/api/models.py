@@ -27,12 +27,48 @@ class Overview(BaseModel):
         default="",
         description="Path to the file that contains the knowledge source."
     )
+    include_figures: bool = Field(
+        default=False,
+        description="Summarize the figures embedded in the PDF and include them in the search."
+    )
+    use_mmr: bool = Field(
+        default=False,
+        description="Diversify standard retrieval results with maximal marginal relevance."
+    )
+    mmr_lambda: float = Field(
+        default=0.5,
+        description="MMR trade-off between relevance (1.0) and diversity (0.0)."
+    )
+    fetch_k: int = Field(
+        default=20,
+        description="Number of most similar chunks re-ranked by MMR."
+    )
+    embedding_provider: str = Field(
+        default="",
+        description="Embedding provider: 'openai', 'local-lsa' or 'transformers'. Empty uses the EMBEDDING_PROVIDER setting."
+    )
+    embedding_model: str = Field(
+        default="",
+        description="Embedding model of the provider. Empty uses the provider's default model."
+    )
+    reference_answers: list = Field(
+        default=[],
+        description="Optional reference answers, aligned with the questions, to score the responses against."
+    )
+    gold_chunk_ids: list = Field(
+        default=[],
+        description="Optional relevant chunk ids per question, aligned with the questions, for hit@k and MRR."
+    )
 
 class NewsQuery(BaseModel):
     query: str = Field(
         default="",
         description="Search query for fetching news articles."
     )
+    k: int = Field(
+        default=5,
+        description="Number of news chunks to return."
+    )
 class ImageQuery(BaseModel):
     question: str = Field(
         default="What is the main topic of the document?",
@@ -49,4 +85,50 @@ class ImageQuery(BaseModel):
     model: str = Field(
         default="pixtral-12b-2409",
         description="Model to be used for image summarization."
-    )
\ No newline at end of file
+    )
+
+class ExperimentRequest(BaseModel):
+    documents: list = Field(
+        default=[],
+        description="Paths to the PDF documents used as knowledge sources."
+    )
+    question: list = Field(
+        default=[],
+        description="Questions asked against every document."
+    )
+    reference_answers: list = Field(
+        default=[],
+        description="Optional reference answers, aligned with the questions."
+    )
+    chunking_strategies: list = Field(
+        default=["fixed"],
+        description="Chunking strategies to compare. Options include 'fixed', 'semantic' and 'structure_based'."
+    )
+    search_types: list = Field(
+        default=["standard"],
+        description="Search types to compare. Options include 'standard' and 'hybrid'."
+    )
+    k_values: list = Field(
+        default=[4],
+        description="Numbers of retrieved documents to compare."
+    )
+    max_workers: int = Field(
+        default=8,
+        description="Maximum number of concurrent ingestion and query tasks."
+    )
+    output_path: str = Field(
+        default="results.jsonl",
+        description="Name of the file the results are streamed to (.jsonl or .parquet), created in the experiments directory."
+    )
+    embedding_provider: str = Field(
+        default="",
+        description="Embedding provider: 'openai', 'local-lsa' or 'transformers'. Empty uses the EMBEDDING_PROVIDER setting."
+    )
+    embedding_model: str = Field(
+        default="",
+        description="Embedding model of the provider. Empty uses the provider's default model."
+    )
+    gold_spans: dict = Field(
+        default={},
+        description="Optional relevant [start, end] character spans of each document's text, keyed by document and then by question, for hit@k and MRR in the evaluation table."
+    )
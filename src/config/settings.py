@@ -1,19 +1,90 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI  # Assuming OpenAI is the correct library you're using
 
 load_dotenv()
 
 class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # Point at integration/fake_services.py (e.g. http://127.0.0.1:8100/v1/) to run without the paid API
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1/")
+    # Replace the Mistral client with an offline stand-in
+    USE_FAKE_MISTRAL = os.getenv("USE_FAKE_MISTRAL", "false").lower() in ("1", "true", "yes")
 
-    # Initialize the OpenAI client
+    # Logging: "development" renders human-readable console output, "production" renders JSON
+    # through a non-blocking queue handler
+    LOG_PROFILE = os.getenv("LOG_PROFILE", "development")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "500"))
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+    # Backends are imported lazily on first use; list names here (comma separated, or "all")
+    # to load them at startup instead
+    WARM_UP_BACKENDS = os.getenv("WARM_UP_BACKENDS", "")
+
+    # Maximum number of prompt tokens used for retrieved context (0 disables the budget)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    # Jaccard similarity above which two retrieved passages are treated as near-duplicates
+    CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.9"))
+
+    # Images sent to the vision model are downsized and recompressed to stay within these budgets
+    IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(1024 * 1024)))
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(512 * 1024)))
+    # Persistent cache of image answers keyed on (image hash, question, model)
+    IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "data/cache/image_summaries.sqlite")
+
+    # Maximum number of concurrent vision calls when summarizing PDF figures
+    FIGURE_SUMMARY_WORKERS = int(os.getenv("FIGURE_SUMMARY_WORKERS", "8"))
+
+    # Outgoing HTTP (news APIs and article pages)
+    HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "data/cache/http_cache")
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+    HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+    NEWS_API_CACHE_SECONDS = int(os.getenv("NEWS_API_CACHE_SECONDS", "300"))
+    NEWS_FETCH_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "32"))
+
+    # Persistent news index and its periodic refresh (0 disables the scheduler)
+    NEWS_INDEX_DIR = os.getenv("NEWS_INDEX_DIR", "data/news_index")
+    NEWS_REFRESH_SECONDS = int(os.getenv("NEWS_REFRESH_SECONDS", "0"))
+    NEWS_GUARDIAN_QUERIES = [q.strip() for q in os.getenv("NEWS_GUARDIAN_QUERIES", "").split(",") if q.strip()]
+    NEWS_NYT_SECTIONS = [s.strip() for s in os.getenv("NEWS_NYT_SECTIONS", "").split(",") if s.strip()]
+    # Local embedding models of the news index are refitted once this share of its chunks is outside the fit
+    NEWS_LOCAL_REFIT_RATIO = float(os.getenv("NEWS_LOCAL_REFIT_RATIO", "0.5"))
+
+    # Directory the /experiments endpoint writes its results to
+    EXPERIMENTS_DIR = os.getenv("EXPERIMENTS_DIR", "data/experiments")
+
+    # Embedding provider used when a request does not choose one: "openai", "local-lsa" or "transformers"
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+    LOCAL_EMBEDDING_DIR = os.getenv("LOCAL_EMBEDDING_DIR", "data/models")
+    LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "256"))
+
+    # Document indexes published as memory-mapped versions shared by all worker processes
+    SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR", "data/indexes")
+    SHARED_INDEX_KEEP_VERSIONS = int(os.getenv("SHARED_INDEX_KEEP_VERSIONS", "2"))
+
+    # Scatter-gather search over a pool of processes (0 searches in the request's own process)
+    SEARCH_PROCESSES = int(os.getenv("SEARCH_PROCESSES", "0"))
+    SEARCH_SHARD_MIN_ITEMS = int(os.getenv("SEARCH_SHARD_MIN_ITEMS", "50000"))
+
+    # Two-stage (document, then section) retrieval over large multi-document indexes
+    HIERARCHICAL_MIN_ITEMS = int(os.getenv("HIERARCHICAL_MIN_ITEMS", "20000"))
+    HIERARCHICAL_TOP_DOCUMENTS = int(os.getenv("HIERARCHICAL_TOP_DOCUMENTS", "20"))
+    HIERARCHICAL_TOP_SECTIONS = int(os.getenv("HIERARCHICAL_TOP_SECTIONS", "40"))
+
+    _openai_client = None
+
+    # Initialize the OpenAI client once and reuse its connection pool
     @property
     def openai_client(self):
-        return OpenAI(
-            base_url="https://api.openai.com/v1/",
-            api_key=self.OPENAI_API_KEY
-        )
+        if Settings._openai_client is None:
+            from openai import OpenAI
+
+            Settings._openai_client = OpenAI(
+                base_url=self.OPENAI_BASE_URL,
+                api_key=self.OPENAI_API_KEY
+            )
+        return Settings._openai_client
 
 # Create a global settings instance
-settings = Settings()
\ No newline at end of file
+settings = Settings()
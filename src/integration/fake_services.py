@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_LATENCY = {
+    "embedding_latency_ms": 40.0,
+    "chat_latency_ms": 400.0,
+    "jitter_ms": 20.0,
+    "error_rate": 0.0,
+}
+
+
+def fake_embedding(text, dimensions=1536):
+    """
+    Deterministic bag-of-words embedding, so similar texts get similar vectors.
+
+    Args:
+        text (str or List[int]): Text to embed, or token ids as sent by langchain.
+        dimensions (int): Length of the vector.
+
+    Returns:
+        np.ndarray: Unit-length float32 vector.
+    """
+    if not isinstance(text, str):
+        text = " ".join(str(token) for token in text)
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if (value >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        vector[0] = 1.0
+        norm = 1.0
+    return vector / norm
+
+
+def _simulated_delay(latency_ms, jitter_ms, rng):
+    return max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000
+
+
+def _should_fail(error_rate, rng):
+    return error_rate > 0 and rng.random() < error_rate
+
+
+def create_fake_openai_app(embedding_latency_ms=DEFAULT_LATENCY["embedding_latency_ms"],
+                           chat_latency_ms=DEFAULT_LATENCY["chat_latency_ms"],
+                           jitter_ms=DEFAULT_LATENCY["jitter_ms"],
+                           error_rate=DEFAULT_LATENCY["error_rate"],
+                           dimensions=1536, seed=None):
+    """
+    Build a local OpenAI-compatible API serving embeddings and chat completions.
+
+    Args:
+        embedding_latency_ms (float): Mean latency of an embeddings request.
+        chat_latency_ms (float): Mean latency of a chat completion.
+        jitter_ms (float): Standard deviation of the latency.
+        error_rate (float): Fraction of requests that fail with a 500 error.
+        dimensions (int): Length of the returned embeddings.
+        seed (int, optional): Seed for reproducible latency and error sampling.
+
+    Returns:
+        FastAPI: The application, to be served with uvicorn.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Fake OpenAI API")
+    rng = random.Random(seed)
+
+    def error_response():
+        return JSONResponse(status_code=500, content={
+            "error": {"message": "Simulated server error", "type": "server_error", "code": None}
+        })
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        await asyncio.sleep(_simulated_delay(embedding_latency_ms, jitter_ms, rng))
+        if _should_fail(error_rate, rng):
+            return error_response()
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text, body.get("dimensions") or dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(text) if not isinstance(text, str) else len(text.split()) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(_simulated_delay(chat_latency_ms, jitter_ms, rng))
+        if _should_fail(error_rate, rng):
+            return error_response()
+
+        messages = body.get("messages", [])
+        prompt = " ".join(str(message.get("content", "")) for message in messages)
+        question = re.search(r"Question:\s*(.*)", prompt)
+        content = f"Offline answer to: {question.group(1).strip() if question else prompt[-200:]}"
+        prompt_tokens = len(prompt.split())
+        completion_tokens = len(content.split())
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+class FakeMistral:
+    """
+    Offline stand-in for `mistralai.Mistral` exposing `chat.complete`.
+
+    Latency and error rate are read from the same defaults as the fake OpenAI server and can be
+    changed through `FakeMistral.configure`.
+    """
+    config = dict(DEFAULT_LATENCY, chat_latency_ms=800.0)
+    _rng = random.Random()
+
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.chat = SimpleNamespace(complete=self._complete)
+
+    @classmethod
+    def configure(cls, **config):
+        cls.config.update(config)
+
+    def _complete(self, model, messages, **kwargs):
+        time.sleep(_simulated_delay(self.config["chat_latency_ms"], self.config["jitter_ms"], self._rng))
+        if _should_fail(self.config["error_rate"], self._rng):
+            raise RuntimeError("Simulated Mistral API error")
+
+        question = next(
+            (part["text"] for message in messages for part in message.get("content", [])
+             if isinstance(part, dict) and part.get("type") == "text"),
+            "",
+        )
+        message = SimpleNamespace(role="assistant", content=f"Offline image summary for: {question}")
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message)])
+
+
+def _free_port(host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai_server(host="127.0.0.1", port=0, **config):
+    """
+    Serve the fake OpenAI API from a background thread.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind, 0 picks a free one.
+        **config: Options passed to create_fake_openai_app.
+
+    Returns:
+        Tuple[str, uvicorn.Server]: The base URL to use as OPENAI_BASE_URL and the server, whose
+            `should_exit` attribute stops it.
+    """
+    import uvicorn
+
+    port = port or _free_port(host)
+    server = uvicorn.Server(uvicorn.Config(create_fake_openai_app(**config), host=host, port=port,
+                                           log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Fake OpenAI server failed to start")
+        time.sleep(0.01)
+
+    base_url = f"http://{host}:{port}/v1/"
+    logger.info("Fake OpenAI server started", base_url=base_url, **config)
+    return base_url, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embedding-latency-ms", type=float, default=DEFAULT_LATENCY["embedding_latency_ms"])
+    parser.add_argument("--chat-latency-ms", type=float, default=DEFAULT_LATENCY["chat_latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_LATENCY["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_LATENCY["error_rate"])
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_fake_openai_app(
+        embedding_latency_ms=args.embedding_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
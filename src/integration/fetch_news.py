@@ -1,12 +1,13 @@
-import requests
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
-from services.data_utils import process_html_to_markdown
+from config.settings import settings
+from services.data_utils import atomic_write_text, process_html_to_markdown
+from services.http_client import fetch
+from utils.hashing import url_id
 from utils.logger_config import setup_logger
 
-load_dotenv()
 logger = setup_logger(__name__)
 
 def fetch_guardian_data(query):
@@ -17,14 +18,14 @@ def fetch_guardian_data(query):
         query (str): The search query for the Guardian API.
 
     Returns:
-        dict: The JSON response from the Guardian API if successful, None otherwise.
+        list: The saved articles if successful, None otherwise.
     """
     GUARDIAN_API_KEY = os.getenv("GUARDIAN_API_KEY")
     url = f"http://content.guardianapis.com/search?q={query}&api-key={GUARDIAN_API_KEY}"
 
     logger.info("Fetching data from Guardian API with query: %s", query)
     # Make the GET request
-    response = requests.get(url)
+    response = fetch(url)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -32,9 +33,10 @@ def fetch_guardian_data(query):
         logger.info("Successfully fetched data from Guardian API.")
 
 
-        guardian_web_urls = [result["webUrl"] for result in data["response"]["results"] if "webUrl" in result]
-        guardian_web_titles = [result["webTitle"] for result in data["response"]["results"] if "webTitle" in result]
-        guardian_news_updates = save_news_data(guardian_web_urls, guardian_web_titles)
+        guardian_results = [result for result in data["response"]["results"] if "webUrl" in result and "webTitle" in result]
+        guardian_web_urls = [result["webUrl"] for result in guardian_results]
+        guardian_web_titles = [result["webTitle"] for result in guardian_results]
+        guardian_news_updates = save_news_data(guardian_web_urls, guardian_web_titles, source="guardian")
 
 
         return guardian_news_updates
@@ -50,7 +52,7 @@ def fetch_nyt_data(section):
         query (str): The search query for the NYT API.
     
     Returns: 
-        dict: The JSON response from the NYT API if successful, None otherwise. 
+        list: The saved articles if successful, None otherwise. 
 
     """
     NYT_API_KEY = os.getenv("NYT_API_KEY")
@@ -58,61 +60,92 @@ def fetch_nyt_data(section):
 
     logger.info("Fetching data from NYT API with section: %s", section)
 
-    response = requests.get(url)
+    response = fetch(url)
     logger.info(f"Fetch NYT Data: {response}")
     if response.status_code == 200:
         data = response.json()
 
-        nyt_web_urls = [result["url"] for result in data["results"] if "url" in result]
-        nyt_web_titles = [result["title"] for result in data["results"] if "title" in result]
-        nyt_news_updates = save_news_data(nyt_web_urls, nyt_web_titles)
+        nyt_results = [result for result in data["results"] if result.get("url") and "title" in result]
+        nyt_web_urls = [result["url"] for result in nyt_results]
+        nyt_web_titles = [result["title"] for result in nyt_results]
+        nyt_news_updates = save_news_data(nyt_web_urls, nyt_web_titles, source="nyt")
 
 
         logger.info("Successfully fetched data from NYT API.")
-        return nyt_web_titles
+        return nyt_news_updates
     else:
         logger.info(f"Error: {response.status_code}, {response.text}")
         return None
     
 
-def save_news_data(web_urls, web_titles):
+def _fetch_article(web_url, title):
+    """
+    Fetch one article and convert it to Markdown, returning None if it fails.
+    """
+    logger.info("Processing URL %s with title '%s'", web_url, title, sampled=True)
+    try:
+        markdown_content = process_html_to_markdown(web_url)  # Fetch the article content in Markdown format
+        if markdown_content is None:
+            logger.warning("Skipping article without extractable content", url=web_url)
+            return None
+        return re.sub(r'http[s]?://\S+', '', markdown_content)
+    except Exception as e:
+        logger.error("Failed to process URL %s: %s", web_url, str(e))
+        return None
+
+def save_news_data(web_urls, web_titles, source=None):
     """
     Saves news articles from a list of URLs to individual Markdown files in a specified directory.
+
+    Articles are fetched concurrently (bounded by settings.NEWS_FETCH_WORKERS overall and
+    settings.HTTP_PER_HOST_CONCURRENCY per host) and each file is written atomically. Files are
+    named after a hash of the article URL, so the same article keeps the same id across runs and
+    sources.
     
     Args:
         web_urls (list): The list containing the URLs of the news articles.
         guardian_web_titles (list): The list containing the titles of the news articles.
+        source (str, optional): Name of the news source, e.g. "guardian" or "nyt".
+
+    Returns:
+        list: The saved articles with their stable id, URL, title, source and content.
     """
     logger.info("Starting the process of saving news data.")
 
     output_folder = "./data/todays_news"
     os.makedirs(output_folder, exist_ok=True)
     logger.info("Output directory '%s' is ready.", output_folder)
+
+    articles = list(zip(web_urls, web_titles))
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.NEWS_FETCH_WORKERS, len(articles)))) as executor:
+        markdown_contents = list(executor.map(lambda article: _fetch_article(*article), articles))
     
     content = []
-    for index, (web_url, title) in enumerate(zip(web_urls, web_titles)):
-        logger.info("Processing URL %s with title '%s'", web_url, title)
+    fetched_at = datetime.now().isoformat(timespec="seconds")
+    for (web_url, title), markdown_content in zip(articles, markdown_contents):
+        if markdown_content is None:
+            continue
         try:
-            markdown_content = process_html_to_markdown(web_url)  # Fetch the article content in Markdown format
-            markdown_content = re.sub(r'http[s]?://\S+', '', markdown_content)
+            document_id = url_id(web_url)
             content.append({
-                "document_id": index,
+                "document_id": document_id,
+                "url": web_url,
                 "title": title,
+                "source": source,
+                "fetched_at": fetched_at,
                 "content": markdown_content
             })
 
-            # Define the file path using the index as the document ID
-            md_file_path = os.path.join(output_folder, f"article_{index}.md")
+            # Define the file path using the stable URL hash as the document ID
+            md_file_path = os.path.join(output_folder, f"article_{document_id}.md")
             
             # Save the Markdown content along with the title to the file
-            with open(md_file_path, "w", encoding="utf-8") as md_file:
-                md_file.write(f"# {title}\n\n")
-                md_file.write(markdown_content)
+            atomic_write_text(md_file_path, f"# {title}\n\n{markdown_content}")
             
-            logger.info("Successfully saved article to %s", md_file_path)
+            logger.info("Successfully saved article to %s", md_file_path, sampled=True)
 
         except Exception as e:
             logger.error("Failed to process and save URL %s: %s", web_url, str(e))
 
     logger.info("Completed saving all articles.")
-    return content
\ No newline at end of file
+    return content
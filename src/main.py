@@ -1,9 +1,51 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from dotenv import load_dotenv
-from services.document_service import process_document
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+
 from api.endpoints import router
+from config.settings import settings
+from services.backends import warm_up
+from services.news_ingestion import NewsRefreshScheduler
+from services.sharded_store import shutdown_search_pool
+from utils.timing import server_timing_header, start_request_timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Optionally load heavy backends before the worker starts accepting requests, run the
+    periodic news refresh while the app is up, and stop the search processes on shutdown.
+    """
+    if settings.WARM_UP_BACKENDS:
+        names = None if settings.WARM_UP_BACKENDS == "all" else [
+            name.strip() for name in settings.WARM_UP_BACKENDS.split(",") if name.strip()
+        ]
+        warm_up(names)
+
+    news_scheduler = None
+    if settings.NEWS_REFRESH_SECONDS > 0:
+        news_scheduler = NewsRefreshScheduler()
+        news_scheduler.start()
+
+    yield
+
+    if news_scheduler is not None:
+        news_scheduler.stop()
+    shutdown_search_pool()
+
+
+app = FastAPI(title="NLP Framework: Enhanced Document Understanding", version="1.0.0", lifespan=lifespan)
+app.include_router(router)
+
 
-load_dotenv() 
-app = FastAPI(title="NLP Framework: Enhanced Document Understanding", version="1.0.0")
-app.include_router(router)
\ No newline at end of file
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """
+    Report per-stage durations (extraction, chunking, embedding, retrieval, generation) in the
+    Server-Timing header.
+    """
+    timings = start_request_timings()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
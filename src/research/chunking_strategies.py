@@ -42,7 +42,7 @@ def cosine_similarity(vec1, vec2):
     Returns:
     float: The cosine similarity between the two vectors.
     """
-    logger.info("Calculating cosine similarity between two vectors")
+    logger.debug("Calculating cosine similarity between two vectors", sampled=True)
     intersection = set(vec1.keys()) & set(vec2.keys())
     numerator = sum([vec1[x] * vec2[x] for x in intersection])
     
@@ -55,7 +55,7 @@ def cosine_similarity(vec1, vec2):
         return 0.0
     
     similarity = float(numerator) / denominator
-    logger.info(f"Cosine similarity calculated: {similarity}")
+    logger.debug("Cosine similarity calculated", similarity=similarity, sampled=True)
     return similarity
 
 
@@ -69,10 +69,10 @@ def create_embedding(text):
     Returns:
     Counter: A Counter object representing word frequencies.
     """
-    logger.info("Creating embedding from text")
+    logger.debug("Creating embedding from text", sampled=True)
     words = re.findall(r'\w+', text.lower())
     embedding = Counter(words)
-    logger.info(f"Embedding created with {len(embedding)} unique words")
+    logger.debug("Embedding created", unique_words=len(embedding), sampled=True)
     return embedding
 
 
@@ -100,10 +100,10 @@ def semantic_chunking(text, similarity_threshold=0.5):
         if similarity >= similarity_threshold:
             current_chunk += " " + sentence
             current_embedding = create_embedding(current_chunk)
-            logger.debug("Appending sentence to current chunk due to high similarity")
+            logger.debug("Appending sentence to current chunk due to high similarity", sampled=True)
         else:
             chunks.append(current_chunk)
-            logger.info("Chunk finalized and added to list")
+            logger.info("Chunk finalized and added to list", sampled=True)
             current_chunk = sentence
             current_embedding = sentence_embedding
     
@@ -136,14 +136,14 @@ def structure_based_chunking(text):
         if re.match(patterns['heading'], line):
             if current_chunk:
                 chunks.append(current_chunk.strip())
-                logger.info("Chunk finalized and added to list based on heading")
+                logger.info("Chunk finalized and added to list based on heading", sampled=True)
             current_chunk = line + '\n'
         elif re.match(patterns['paragraph'], line):
             current_chunk += line + '\n'
         else:
             if current_chunk:
                 chunks.append(current_chunk.strip())
-                logger.info("Chunk finalized and added to list based on paragraph")
+                logger.info("Chunk finalized and added to list based on paragraph", sampled=True)
             current_chunk = ''
     
     if current_chunk:
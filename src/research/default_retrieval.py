@@ -1,134 +1,271 @@
-from dotenv import load_dotenv
-from langchain.retrievers import BM25Retriever, EnsembleRetriever
-from langchain.vectorstores import Chroma
-from langchain.vectorstores import FAISS
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
-
+from services.backends import get_backend
 from services.embedding_service import create_embeddings
-from services.document_service import process_document
+from services.document_service import load_or_build_index
+from research.evaluation import evaluate_answers
 from utils.logger_config import setup_logger
 from utils.generate_response_llm import generate_response
-from config.settings import settings
+from utils.timing import timed
 
 logger = setup_logger(__name__)
 
-load_dotenv()
-client = settings.openai_client
+def _space_embeddings(embedding_space):
+    """
+    Expose create_embeddings for one embedding space through langchain's Embeddings interface.
+    """
+    Embeddings = get_backend("langchain")["Embeddings"]
+
+    class SpaceEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return create_embeddings(list(texts), space=embedding_space)
+
+        def embed_query(self, text):
+            return create_embeddings(text, space=embedding_space)
+
+    return SpaceEmbeddings()
+
+def build_hybrid_retriever(chunks, vector_store, k=3):
+    """
+    Build a BM25 + FAISS ensemble retriever over already processed chunks.
+
+    The FAISS index is built from the embeddings already held by the vector store, so the chunks
+    are not embedded a second time. Queries are embedded in the vector store's embedding space.
+
+    Args:
+        chunks (List[str]): Document chunks
+        vector_store (SimpleVectorStore): Vector store holding the chunk embeddings
+        k (int): Number of documents each retriever returns
+
+    Returns:
+        EnsembleRetriever: Retriever combining keyword and vector search
+    """
+    langchain = get_backend("langchain")
+    Document = langchain["Document"]
+
+    docs = [Document(page_content=t, metadata={**vector_store.metadata[i], "chunk":i}) for i,t in enumerate(chunks)]
+    bm25_retriever = langchain["BM25Retriever"].from_documents(docs)
+    bm25_retriever.k = k
+
+    faiss_vectorstore = langchain["FAISS"].from_embeddings(
+        text_embeddings=[(t, list(v)) for t, v in zip(chunks, vector_store.vectors)],
+        embedding=_space_embeddings(vector_store.embedding_space),
+        metadatas=[doc.metadata for doc in docs],
+    )
+    # Create a retriever from the vectorstore
+    faiss_retriever = faiss_vectorstore.as_retriever(search_kwargs={"k": k})
+
+    # initialize the ensemble retriever
+    return langchain["EnsembleRetriever"](retrievers=[bm25_retriever, faiss_retriever],
+                                          weights=[0.5, 0.5])
+
+def run_standard_query(query, vector_store, k=4, query_embedding=None, timings=None, mmr=None, context_stats=None):
+    """
+    Retrieve documents for a single query from the vector store and generate a response.
+
+    Args:
+        query (str): User query
+        vector_store (SimpleVectorStore): Vector store of the processed document
+        k (int): Number of documents to retrieve
+        query_embedding (List[float], optional): Precomputed embedding of the query
+        timings (dict, optional): Collects per-stage durations in seconds
+        mmr (dict, optional): Diversify the results with maximal marginal relevance, using the
+            given "fetch_k" and "lambda_mult" options
+        context_stats (dict, optional): Collects the context packing statistics, see generate_response
+
+    Returns:
+        Tuple[List[Dict], str]: Retrieved documents and generated response
+    """
+    timings = {} if timings is None else timings
+    if query_embedding is None:
+        with timed(timings, "embed_s"):
+            query_embedding = create_embeddings(query, space=vector_store.embedding_space)
+    with timed(timings, "retrieve_s"):
+        if mmr is not None:
+            standard_docs = vector_store.max_marginal_relevance_search(query_embedding, k=k, **mmr)
+        else:
+            standard_docs = vector_store.similarity_search(query_embedding, k=k)
+    logger.debug("Standard documents retrieved", count=len(standard_docs), documents=standard_docs)
+    with timed(timings, "generate_s"):
+        standard_response = generate_response(query, standard_docs, "General", context_stats=context_stats)
+    return standard_docs, standard_response
+
+def run_hybrid_query(query, retriever, timings=None, context_stats=None):
+    """
+    Retrieve documents for a single query with a hybrid retriever and generate a response.
+
+    Args:
+        query (str): User query
+        retriever (EnsembleRetriever): Retriever built by build_hybrid_retriever
+        timings (dict, optional): Collects per-stage durations in seconds
+        context_stats (dict, optional): Collects the context packing statistics, see generate_response
+
+    Returns:
+        Tuple[List[Document], str]: Retrieved documents and generated response
+    """
+    timings = {} if timings is None else timings
+    with timed(timings, "retrieve_s"):
+        hybrid_docs = retriever.get_relevant_documents(query)
+
+    # Extract page_content from each Document for generating a response
+    response_contents = [{"text": doc.page_content, "metadata": doc.metadata} for doc in hybrid_docs]
+    with timed(timings, "generate_s"):
+        hybrid_response = generate_response(query, response_contents, "General", context_stats=context_stats)
+    return hybrid_docs, hybrid_response
 
-def similarity_search(pdf_path, chunking_strategy, test_queries, reference_answers=None):
+def _evaluate(results, method, reference_answers, gold_chunk_ids, chunk_id_key, embedding_space):
+    """
+    Score every result of a run in one batch, adding an "evaluation" entry to each of them.
+
+    Answers are compared in the embedding space of the index they were retrieved from. A failed
+    evaluation is logged rather than raised, so the responses are still returned.
+
+    Returns:
+        Dict: Mean scores over the run, or None without reference answers or gold chunk ids, or
+            if the evaluation failed
+    """
+    if not reference_answers and not gold_chunk_ids:
+        return None
+    responses = [result[method]["response"] for result in results]
+    references = [result.get("reference_answer") for result in results]
+    retrieved = [[chunk_id_key(doc) for doc in result[method]["documents"]] for result in results]
+    try:
+        with timed(None, "evaluate_s"):
+            per_query, overall = evaluate_answers(responses, references, retrieved, gold_chunk_ids,
+                                                  embedding_space=embedding_space)
+    except Exception as e:
+        logger.error("Evaluation failed", method=method, error=str(e))
+        return None
+    for result, scores in zip(results, per_query):
+        result["evaluation"] = scores
+    return overall
+
+def similarity_search(pdf_path, chunking_strategy, test_queries, reference_answers=None, k=4, include_figures=False,
+                      mmr=None, embedding_provider=None, embedding_model=None, gold_chunk_ids=None):
     """
     standard retrieval on a set of test queries.
-    
-    This function processes a document, runs standard methods on each test query, and compares their performance. 
 
-    
+    This function processes a document, runs standard methods on each test query, and compares their performance.
+
+
     Args:
         pdf_path (str): Path to PDF document to be processed as the knowledge source
         chunking_strategies (str): Chunking strategy for processing the document
         test_queries (List[str]): List of test queries to evaluate both retrieval methods
         reference_answers (List[str], optional): Reference answers for evaluation metrics
-        
+        k (int): Number of documents to retrieve per query
+        include_figures (bool): Also index summaries of the figures embedded in the PDF
+        mmr (dict, optional): Diversify the retrieved chunks with maximal marginal relevance,
+            e.g. {"fetch_k": 20, "lambda_mult": 0.5}
+        embedding_provider (str, optional): Embedding provider used for the chunks and the queries
+        embedding_model (str, optional): Embedding model of the provider
+        gold_chunk_ids (List[List[int]], optional): Relevant chunk ids per query, for hit@k and MRR
+
     Returns:
         Dict: Evaluation results containing individual query results and overall comparison
     """
     logger.info("Starting the standard retrieval process")
-    chunks, vector_store = process_document(pdf_path, chunking_strategy)
-    
+    chunks, vector_store = load_or_build_index(pdf_path, chunking_strategy, include_figures=include_figures,
+                                               embedding_provider=embedding_provider,
+                                               embedding_model=embedding_model)
+
     results = []
     try:
-        for i, query in enumerate(test_queries):
+        # Embed every query in a single request
+        with timed(None, "embed_queries_s"):
+            query_embeddings = (create_embeddings(list(test_queries), space=vector_store.embedding_space)
+                                if test_queries else [])
+
+        for i, (query, query_embedding) in enumerate(zip(test_queries, query_embeddings)):
             logger.info(f"Query {i+1}: {query}")
-            
-            query_embedding = create_embeddings(query)
-            standard_docs = vector_store.similarity_search(query_embedding, k=4)
-            logger.info(f"Standard documents retrieved: {standard_docs}")
-            standard_response = generate_response(query, standard_docs, "General")
-            
+
+            context_stats = {}
+            standard_docs, standard_response = run_standard_query(query, vector_store, k, query_embedding, mmr=mmr,
+                                                                  context_stats=context_stats)
+
             result = {
                 "query": query,
                 "standard_retrieval": {
                     "documents": standard_docs,
-                    "response": standard_response
+                    "response": standard_response,
+                    "context": context_stats
                 }
             }
-            
+
             if reference_answers and i < len(reference_answers):
                 result["reference_answer"] = reference_answers[i]
-                
+
             results.append(result)
-            
-            logger.info("Finished the standard retrieval process")
-        
-        
+
+        evaluation = _evaluate(results, "standard_retrieval", reference_answers, gold_chunk_ids,
+                               lambda doc: doc["metadata"].get("index"), vector_store.embedding_space)
+        logger.info("Finished the standard retrieval process")
+
         return {
             "results": results,
+            "evaluation": evaluation,
         }
     except Exception as e:
         logger.error("An error occurred while performing the standard retrieval: %s", e)
-        raise e 
-    
-def hybrid_search(pdf_path, chunking_strategy, test_queries, reference_answers=None):
+        raise e
+
+def hybrid_search(pdf_path, chunking_strategy, test_queries, reference_answers=None, k=3, include_figures=False,
+                  embedding_provider=None, embedding_model=None, gold_chunk_ids=None):
     """
     Hybrid search on a set of test queries.
-    
-    This function processes a document, runs hybrid methods on each test query, and compares their performance. 
 
-    
+    This function processes a document, runs hybrid methods on each test query, and compares their performance.
+
+
     Args:
         pdf_path (str): Path to PDF document to be processed as the knowledge source
         chunking_strategies (str): Chunking strategy for processing the document
         test_queries (List[str]): List of test queries
         reference_answers (List[str], optional): Reference answers for evaluation metrics
-        
+        k (int): Number of documents each retriever returns per query
+        include_figures (bool): Also index summaries of the figures embedded in the PDF
+        embedding_provider (str, optional): Embedding provider used for the chunks and the queries
+        embedding_model (str, optional): Embedding model of the provider
+        gold_chunk_ids (List[List[int]], optional): Relevant chunk ids per query, for hit@k and MRR
+
     Returns:
         Dict: Evaluation results containing individual query results and overall comparison
     """
     logger.info("Starting the hybrid search process")
-    chunks, vector_store = process_document(pdf_path, chunking_strategy)
-    
+    chunks, vector_store = load_or_build_index(pdf_path, chunking_strategy, include_figures=include_figures,
+                                               embedding_provider=embedding_provider,
+                                               embedding_model=embedding_model)
 
     results = []
     try:
+        # The retriever only depends on the document, so it is built once for all queries
+        ensemble_retriever = build_hybrid_retriever(chunks, vector_store, k)
+
         for i, query in enumerate(test_queries):
-            logger.info(f"\n\nQuery {i+1}: {query}")
-            
-            logger.info("\n--- Hybrid Search ---")
-            docs = [Document(page_content=t, metadata={"source":"source", "chunk":i}) for i,t in enumerate(chunks)]
-            bm25_retriever = BM25Retriever.from_documents(docs)
-            bm25_retriever.k = 3
-
-            embedding = OpenAIEmbeddings()
-            faiss_vectorstore = FAISS.from_documents(docs, embedding)
-            # Create a retriever from the vectorstore
-            faiss_retriever = faiss_vectorstore.as_retriever(search_kwargs={"k": 3})
-
-            # initialize the ensemble retriever
-            ensemble_retriever = EnsembleRetriever(retrievers=[bm25_retriever, faiss_retriever],
-                                                weights=[0.5, 0.5])
-            
-            hybrid_docs = ensemble_retriever.get_relevant_documents(query)
-
-            # Extract page_content from each Document for generating a response
-            response_contents = [{"text": doc.page_content} for doc in hybrid_docs]
-            hybrid_response = generate_response(query, response_contents, "General")
-            
+            logger.info(f"Query {i+1}: {query}")
+
+            context_stats = {}
+            hybrid_docs, hybrid_response = run_hybrid_query(query, ensemble_retriever, context_stats=context_stats)
+
             result = {
                 "query": query,
                 "hybrid_search": {
                     "documents": hybrid_docs,
-                    "response": hybrid_response
+                    "response": hybrid_response,
+                    "context": context_stats
                 }
             }
-            
+
             if reference_answers and i < len(reference_answers):
                 result["reference_answer"] = reference_answers[i]
-                
+
             results.append(result)
-            
+
+        evaluation = _evaluate(results, "hybrid_search", reference_answers, gold_chunk_ids,
+                               lambda doc: doc.metadata.get("chunk"), vector_store.embedding_space)
+
         return {
             "results": results,
+            "evaluation": evaluation,
         }
     except Exception as e:
         logger.error("An error occurred while performing the hybrid search: %s", e)
-        raise e
\ No newline at end of file
+        raise e
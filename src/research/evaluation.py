@@ -0,0 +1,449 @@
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from services.backends import get_backend
+from services.embedding_providers import get_embedding_provider
+from services.embedding_service import create_embeddings
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+ANSWER_METRICS = ("embedding_cosine", "token_f1", "rouge_l")
+RETRIEVAL_METRICS = ("hit_at_k", "mrr")
+
+# Texts per embeddings request; the OpenAI API accepts up to 2048 inputs
+EMBEDDING_BATCH_SIZE = 2048
+
+# Fewest distinct texts a local model is fitted on for the embedding cosine score when no index
+# space is given
+LOCAL_FIT_MIN_TEXTS = 100
+
+_TOKEN_PATTERN = r"(?u)\b\w+\b"
+
+
+def _tokenize(text):
+    return re.findall(_TOKEN_PATTERN, text.lower())
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _f1(overlap, predicted, expected):
+    """
+    Harmonic mean of overlap / predicted and overlap / expected, 0 where either length is 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, overlap / predicted, 0.0)
+        recall = np.where(expected > 0, overlap / expected, 0.0)
+        return np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+
+def token_f1(responses, references):
+    """
+    Bag-of-words F1 of each (response, reference) pair, computed on sparse count matrices.
+
+    Args:
+    responses (List[str]): Generated answers.
+    references (List[str]): Reference answers aligned with `responses`.
+
+    Returns:
+    np.ndarray: One score per pair.
+    """
+    if not responses:
+        return np.zeros(0)
+    vectorizer = get_backend("sklearn_text")["CountVectorizer"](token_pattern=_TOKEN_PATTERN, lowercase=True)
+    try:
+        counts = vectorizer.fit_transform(list(responses) + list(references))
+    except ValueError:
+        # Every text is empty, so nothing overlaps
+        return np.zeros(len(responses))
+    response_counts, reference_counts = counts[:len(responses)], counts[len(responses):]
+    overlap = np.asarray(response_counts.minimum(reference_counts).sum(axis=1)).ravel()
+    return _f1(overlap, np.asarray(response_counts.sum(axis=1)).ravel(),
+               np.asarray(reference_counts.sum(axis=1)).ravel())
+
+
+def rouge_l(responses, references):
+    """
+    ROUGE-L F1 of each (response, reference) pair over word tokens.
+
+    The longest common subsequences of all pairs are computed by RapidFuzz in one call, in C and on
+    all cores.
+
+    Args:
+    responses (List[str]): Generated answers.
+    references (List[str]): Reference answers aligned with `responses`.
+
+    Returns:
+    np.ndarray: One score per pair.
+    """
+    if not responses:
+        return np.zeros(0)
+    from rapidfuzz.distance import LCSseq
+    from rapidfuzz.process import cpdist
+
+    response_tokens = [_tokenize(text) for text in responses]
+    reference_tokens = [_tokenize(text) for text in references]
+    lcs = cpdist(response_tokens, reference_tokens, scorer=LCSseq.similarity, workers=-1).astype(np.float64)
+    return _f1(lcs, np.array([len(tokens) for tokens in response_tokens], dtype=np.float64),
+               np.array([len(tokens) for tokens in reference_tokens], dtype=np.float64))
+
+
+def _cosine_space(texts, embedding_provider, embedding_model):
+    """
+    Return the embedding space to compare `texts` in when no index space is given, or None.
+
+    Providers fitted per corpus only get a space fitted on the evaluated texts themselves when
+    there are enough of them for the fit to be meaningful: with a few texts the projection has a
+    handful of components and every cosine collapses to about +-1.
+    """
+    embedder = get_embedding_provider(embedding_provider, embedding_model)
+    if not embedder.requires_fit:
+        return embedder.space
+    if len(texts) < LOCAL_FIT_MIN_TEXTS:
+        logger.warning("Too few texts to fit a local embedding model, skipping the embedding cosine score",
+                       texts=len(texts), min_texts=LOCAL_FIT_MIN_TEXTS)
+        return None
+    return embedder.fit(texts, persist=False)
+
+
+def embedding_cosine(responses, references, embedding_provider=None, embedding_model=None, embedding_space=None):
+    """
+    Cosine similarity between the embeddings of each (response, reference) pair.
+
+    Each distinct text is embedded once, in as few batched requests as possible. Both sides are
+    embedded in `embedding_space` when given, e.g. the space of the index the answers were
+    retrieved from.
+
+    Args:
+    responses (List[str]): Generated answers.
+    references (List[str]): Reference answers aligned with `responses`.
+    embedding_provider (str, optional): Embedding provider. Defaults to settings.EMBEDDING_PROVIDER.
+    embedding_model (str, optional): Embedding model of the provider.
+    embedding_space (str, optional): Already fitted embedding space to compare the texts in;
+        overrides `embedding_provider` and `embedding_model`.
+
+    Returns:
+    np.ndarray or None: One score per pair, or None if the texts could not be embedded (e.g. too
+        few texts to fit a local model, or a space that is no longer available).
+    """
+    if not responses:
+        return np.zeros(0)
+    texts = list(dict.fromkeys(list(responses) + list(references)))
+    try:
+        space = embedding_space or _cosine_space(texts, embedding_provider, embedding_model)
+        if space is None:
+            return None
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            vectors.extend(create_embeddings(texts[start:start + EMBEDDING_BATCH_SIZE], space=space))
+    except ValueError as e:
+        # e.g. an empty vocabulary, or a local model that was discarded
+        logger.warning("Could not embed the answers, skipping the embedding cosine score", error=str(e))
+        return None
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    positions = {text: i for i, text in enumerate(texts)}
+    response_rows = matrix[[positions[text] for text in responses]]
+    reference_rows = matrix[[positions[text] for text in references]]
+    return np.einsum("ij,ij->i", response_rows, reference_rows).astype(np.float64)
+
+
+def score_answers(responses, references, embedding_provider=None, embedding_model=None, use_embeddings=True,
+                  embedding_spaces=None):
+    """
+    Score generated answers against reference answers, all pairs at once.
+
+    Pairs with a missing response or reference (e.g. a failed query) get NaN scores, as do the
+    embedding cosine scores of pairs that could not be embedded.
+
+    Args:
+    responses (List[str]): Generated answers.
+    references (List[str]): Reference answers aligned with `responses`.
+    embedding_provider (str, optional): Embedding provider used for the cosine score.
+    embedding_model (str, optional): Embedding model of the provider.
+    use_embeddings (bool): Whether to compute the embedding cosine score.
+    embedding_spaces (str or List[str], optional): Embedding space to compare each pair in, e.g.
+        the space of the index it was retrieved from; one for all pairs or one per pair.
+
+    Returns:
+    Dict[str, np.ndarray]: Scores per metric, aligned with the pairs.
+    """
+    valid = np.array([not _missing(response) and not _missing(reference)
+                      for response, reference in zip(responses, references)], dtype=bool)
+    valid_responses = [response for response, keep in zip(responses, valid) if keep]
+    valid_references = [reference for reference, keep in zip(references, valid) if keep]
+
+    scores = {
+        "token_f1": token_f1(valid_responses, valid_references),
+        "rouge_l": rouge_l(valid_responses, valid_references),
+    }
+    if use_embeddings:
+        if embedding_spaces is None or isinstance(embedding_spaces, str):
+            embedding_spaces = [embedding_spaces] * len(valid)
+        valid_spaces = [space for space, keep in zip(embedding_spaces, valid) if keep]
+        cosines = np.full(len(valid_responses), np.nan)
+        # Pairs are embedded in batches per space; vectors from different spaces are never compared
+        for space in dict.fromkeys(valid_spaces):
+            positions = [i for i, pair_space in enumerate(valid_spaces) if pair_space == space]
+            values = embedding_cosine([valid_responses[i] for i in positions], [valid_references[i] for i in positions],
+                                      embedding_provider, embedding_model, space)
+            if values is not None:
+                cosines[positions] = values
+        scores["embedding_cosine"] = cosines
+    logger.info("Scored answers", pairs=len(valid), scored=len(valid_responses))
+
+    aligned = {}
+    for metric, values in scores.items():
+        aligned[metric] = np.full(len(valid), np.nan)
+        aligned[metric][valid] = values
+    return aligned
+
+
+def _rank_metrics(relevance, k=None):
+    """
+    Hit rate and reciprocal rank of the first relevant result of each query.
+
+    Args:
+    relevance (List[List[bool]]): Whether each retrieved result is relevant, best first; None skips the query.
+    k (int, optional): Only the first k results are considered.
+
+    Returns:
+    Dict[str, np.ndarray]: "hit_at_k" and "mrr" per query, NaN for skipped queries.
+    """
+    hits = np.full(len(relevance), np.nan)
+    reciprocal_ranks = np.full(len(relevance), np.nan)
+    for i, relevant in enumerate(relevance):
+        if relevant is None:
+            continue
+        ranks = [rank for rank, is_relevant in enumerate(relevant[:k], start=1) if is_relevant]
+        hits[i] = 1.0 if ranks else 0.0
+        reciprocal_ranks[i] = 1.0 / ranks[0] if ranks else 0.0
+    return {"hit_at_k": hits, "mrr": reciprocal_ranks}
+
+
+def retrieval_metrics(retrieved_chunk_ids, gold_chunk_ids, k=None):
+    """
+    Hit rate and reciprocal rank of the first relevant chunk of each query, by chunk id.
+
+    Chunk ids are only meaningful within one index, so this suits runs over a single document and
+    chunking strategy; use span_retrieval_metrics to compare indexes.
+
+    Args:
+    retrieved_chunk_ids (List[List[int]]): Retrieved chunk ids per query, best first; None skips the query.
+    gold_chunk_ids (List[List[int]]): Relevant chunk ids per query; None skips the query.
+    k (int, optional): Only the first k retrieved chunks are considered.
+
+    Returns:
+    Dict[str, np.ndarray]: "hit_at_k" and "mrr" per query, NaN for skipped queries.
+    """
+    relevance = []
+    for retrieved, gold in zip(retrieved_chunk_ids, gold_chunk_ids):
+        if retrieved is None or gold is None:
+            relevance.append(None)
+            continue
+        gold = set(gold)
+        relevance.append([chunk_id in gold for chunk_id in retrieved])
+    return _rank_metrics(relevance, k)
+
+
+def _overlaps(span, gold_spans):
+    start, end = span
+    if start is None or end is None:
+        return False
+    return any(start < gold_end and gold_start < end for gold_start, gold_end in gold_spans)
+
+
+def span_retrieval_metrics(retrieved_spans, gold_spans, k=None):
+    """
+    Hit rate and reciprocal rank of the first relevant chunk of each query, by character span.
+
+    A retrieved chunk is relevant when its [start, end) offsets in the document text overlap a gold
+    span, so the same gold spans apply to every chunking strategy of a document.
+
+    Args:
+    retrieved_spans (List[List[Tuple[int, int]]]): (start, end) of each retrieved chunk per query, best
+        first; None skips the query.
+    gold_spans (List[List[Tuple[int, int]]]): Relevant (start, end) spans per query; None skips the query.
+    k (int, optional): Only the first k retrieved chunks are considered.
+
+    Returns:
+    Dict[str, np.ndarray]: "hit_at_k" and "mrr" per query, NaN for skipped queries.
+    """
+    relevance = [None if spans is None or gold is None else [_overlaps(span, gold) for span in spans]
+                 for spans, gold in zip(retrieved_spans, gold_spans)]
+    return _rank_metrics(relevance, k)
+
+
+def evaluate_answers(responses, references, retrieved_chunk_ids=None, gold_chunk_ids=None, embedding_provider=None,
+                     embedding_model=None, embedding_space=None):
+    """
+    Score the answers of a batch of queries, for inclusion in an API response.
+
+    Args:
+    responses (List[str]): Generated answers.
+    references (List[str]): Reference answers aligned with `responses`; None where there is none.
+    retrieved_chunk_ids (List[List[int]], optional): Retrieved chunk ids per query, best first.
+    gold_chunk_ids (List[List[int]], optional): Relevant chunk ids per query.
+    embedding_provider (str, optional): Embedding provider used for the cosine score.
+    embedding_model (str, optional): Embedding model of the provider.
+    embedding_space (str, optional): Embedding space of the index the answers were retrieved from,
+        used for the cosine score.
+
+    Returns:
+    Tuple[List[Dict], Dict]: Scores per query, and their means over the scored queries.
+        Missing scores are None.
+    """
+    scores = score_answers(responses, references, embedding_provider, embedding_model,
+                           embedding_spaces=embedding_space)
+    if retrieved_chunk_ids is not None and gold_chunk_ids:
+        gold_chunk_ids = list(gold_chunk_ids) + [None] * (len(responses) - len(gold_chunk_ids))
+        scores.update(retrieval_metrics(retrieved_chunk_ids, gold_chunk_ids))
+
+    def _value(value):
+        return None if np.isnan(value) else float(value)
+
+    per_query = [{metric: _value(values[i]) for metric, values in scores.items()} for i in range(len(responses))]
+    overall = {metric: _value(np.nanmean(values)) if not np.isnan(values).all() else None
+               for metric, values in scores.items()}
+    return per_query, overall
+
+
+def _as_list(value):
+    # Parquet results store lists as JSON strings
+    if isinstance(value, str):
+        return json.loads(value)
+    return [] if value is None else list(value)
+
+
+def evaluate_rows(rows, gold_spans=None, embedding_provider=None, embedding_model=None, use_embeddings=True):
+    """
+    Score experiment rows in one batch.
+
+    Failed rows (with an error or without a response) get NaN scores, so they are left out of the
+    means rather than counted as misses.
+
+    Args:
+    rows (List[Dict]): Rows with "document", "query", "response", "error", "reference_answer",
+        "retrieved_spans" and "embedding_space", as written by research.experiment_runner. Answers are
+        compared in the embedding space of their row's index.
+    gold_spans (Dict[str, Dict[str, List[Tuple[int, int]]]], optional): Relevant (start, end) spans of
+        the document text, per document and question.
+    embedding_provider (str, optional): Embedding provider used for the cosine score of rows without
+        an embedding space.
+    embedding_model (str, optional): Embedding model of the provider.
+    use_embeddings (bool): Whether to compute the embedding cosine score.
+
+    Returns:
+    pd.DataFrame: The rows, with one column per metric.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    failed = frame["response"].map(_missing)
+    if "error" in frame:
+        failed |= frame["error"].notna()
+    responses = frame["response"].where(~failed, None).tolist()
+    references = frame["reference_answer"].tolist() if "reference_answer" in frame else [None] * len(frame)
+    spaces = ([None if _missing(space) else space for space in frame["embedding_space"]]
+              if "embedding_space" in frame else None)
+    scores = score_answers(responses, references, embedding_provider, embedding_model, use_embeddings, spaces)
+    for metric, values in scores.items():
+        frame[metric] = values
+
+    if gold_spans:
+        retrieved = [None if is_failed else _as_list(value)
+                     for value, is_failed in zip(frame["retrieved_spans"], failed)]
+        gold = [gold_spans.get(document, {}).get(query) for document, query in zip(frame["document"], frame["query"])]
+        metrics = span_retrieval_metrics(retrieved, gold)
+        for metric, values in metrics.items():
+            frame[metric] = values
+    return frame
+
+
+def aggregate(frame, group_by=("chunking_strategy", "search_type")):
+    """
+    Average every metric per group.
+
+    Args:
+    frame (pd.DataFrame): Scored rows, as returned by evaluate_rows.
+    group_by (Tuple[str]): Columns to group by.
+
+    Returns:
+    pd.DataFrame: One row per group with its number of rows and the mean of each metric.
+    """
+    metrics = [metric for metric in ANSWER_METRICS + RETRIEVAL_METRICS if metric in frame]
+    group_by = [column for column in group_by if column in frame]
+    if frame.empty or not group_by:
+        return frame
+    groups = frame.groupby(group_by)
+    table = groups[metrics].mean()
+    table.insert(0, "rows", groups.size())
+    return table.reset_index()
+
+
+def evaluate_results_file(path, gold_spans=None, group_by=("chunking_strategy", "search_type"),
+                          embedding_provider=None, embedding_model=None, use_embeddings=True):
+    """
+    Score an experiment results file (.jsonl or .parquet) and aggregate the scores.
+
+    Args:
+    path (str): Results file written by research.experiment_runner.
+    gold_spans (Dict[str, Dict[str, List[Tuple[int, int]]]], optional): Relevant (start, end) spans of
+        the document text, per document and question.
+    group_by (Tuple[str]): Columns to group by.
+    embedding_provider (str, optional): Embedding provider used for the cosine score.
+    embedding_model (str, optional): Embedding model of the provider.
+    use_embeddings (bool): Whether to compute the embedding cosine score.
+
+    Returns:
+    pd.DataFrame: Aggregate table, as returned by aggregate.
+    """
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        rows = pd.read_parquet(path).to_dict("records")
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    frame = evaluate_rows(rows, gold_spans, embedding_provider, embedding_model, use_embeddings)
+    return aggregate(frame, group_by)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score experiment results against reference answers.")
+    parser.add_argument("results", help="Results file written by research.experiment_runner")
+    parser.add_argument("--gold", default=None,
+                        help="JSON file mapping each document to the relevant [start, end] spans of each question")
+    parser.add_argument("--group-by", nargs="+", default=["chunking_strategy", "search_type"])
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip the embedding cosine score")
+    parser.add_argument("--embedding-provider", default=None)
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--output", default=None, help="Also write the aggregate table to this CSV file")
+    args = parser.parse_args()
+
+    gold_spans = None
+    if args.gold:
+        with open(args.gold, encoding="utf-8") as f:
+            gold_spans = json.load(f)
+
+    table = evaluate_results_file(args.results, gold_spans, args.group_by, args.embedding_provider,
+                                  args.embedding_model, not args.no_embeddings)
+    print(table.to_string(index=False))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        table.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
+
+from research.default_retrieval import build_hybrid_retriever, run_hybrid_query, run_standard_query
+from config.settings import settings
+from research.evaluation import aggregate, evaluate_rows
+from services.document_service import load_or_build_index
+from services.embedding_providers import get_embedding_provider
+from services.embedding_service import create_embeddings
+from utils.logger_config import setup_logger
+from utils.timing import timed
+
+logger = setup_logger(__name__)
+
+SEARCH_TYPES = ("standard", "hybrid")
+
+# Row fields kept in memory for the evaluation once the run is done
+EVALUATION_FIELDS = ("document", "chunking_strategy", "search_type", "k", "query", "response", "error",
+                     "reference_answer", "retrieved_spans", "embedding_space")
+
+
+# Parquet columns of a result row; values of other keys are kept as JSON in the "extra" column
+PARQUET_COLUMNS = (
+    ("document", "string"),
+    ("chunking_strategy", "string"),
+    ("search_type", "string"),
+    ("k", "int64"),
+    ("query", "string"),
+    ("reference_answer", "string"),
+    ("response", "string"),
+    ("error", "string"),
+    ("retrieved_chunk_ids", "string"),
+    ("retrieved_spans", "string"),
+    ("embedding_space", "string"),
+    ("ingest_s", "float64"),
+    ("embed_s", "float64"),
+    ("retrieve_s", "float64"),
+    ("generate_s", "float64"),
+    ("context_tokens_before", "int64"),
+    ("context_tokens_after", "int64"),
+    ("context_tokens_saved", "int64"),
+    ("context_merged_chunks", "int64"),
+    ("context_dropped_duplicates", "int64"),
+    ("context_dropped_over_budget", "int64"),
+    ("extra", "string"),
+)
+
+
+class ResultWriter:
+    """
+    Thread-safe writer that streams experiment rows to a JSONL or Parquet file.
+
+    Parquet output is buffered and flushed as row groups of `batch_size` rows, with the fixed schema
+    PARQUET_COLUMNS: lists are stored as JSON strings and keys without a column as JSON in "extra".
+    """
+    def __init__(self, output_path, batch_size=256):
+        self.output_path = output_path
+        self.batch_size = batch_size
+        self.format = "parquet" if output_path.endswith(".parquet") else "jsonl"
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._parquet_writer = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        if self.format == "jsonl":
+            self._file = open(self.output_path, "w", encoding="utf-8")
+        return self
+
+    def write(self, row):
+        """
+        Append a single result row.
+        """
+        with self._lock:
+            if self.format == "jsonl":
+                self._file.write(json.dumps(row, default=str) + "\n")
+                self._file.flush()
+            else:
+                self._buffer.append(row)
+                if len(self._buffer) >= self.batch_size:
+                    self._flush_parquet()
+            self.rows_written += 1
+
+    def _flush_parquet(self):
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet_writer is None:
+            schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in PARQUET_COLUMNS])
+            self._parquet_writer = pq.ParquetWriter(self.output_path, schema)
+        rows = [self._parquet_row(row) for row in self._buffer]
+        self._parquet_writer.write_table(pa.Table.from_pylist(rows, schema=self._parquet_writer.schema))
+        self._buffer = []
+
+    @staticmethod
+    def _parquet_row(row):
+        columns = {name for name, _ in PARQUET_COLUMNS}
+        parquet_row = {key: json.dumps(value, default=str) if isinstance(value, (list, dict)) else value
+                       for key, value in row.items() if key in columns}
+        extra = {key: value for key, value in row.items() if key not in columns}
+        parquet_row["extra"] = json.dumps(extra, default=str) if extra else None
+        return parquet_row
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            if self.format == "jsonl":
+                self._file.close()
+            else:
+                self._flush_parquet()
+                if self._parquet_writer is not None:
+                    self._parquet_writer.close()
+        return False
+
+
+def experiment_output_path(file_name):
+    """
+    Resolve the results file name of an API request inside settings.EXPERIMENTS_DIR.
+
+    Args:
+        file_name (str): Bare file name ending in .jsonl or .parquet, e.g. "results.jsonl"
+
+    Returns:
+        str: Path of the results file
+
+    Raises:
+        ValueError: If the name contains a directory part or has another extension
+    """
+    if (not file_name or os.path.isabs(file_name) or os.path.basename(file_name) != file_name
+            or "/" in file_name or "\\" in file_name or file_name in (".", "..")):
+        raise ValueError(f"output_path must be a file name without directories, got {file_name!r}")
+    if not file_name.endswith((".jsonl", ".parquet")):
+        raise ValueError(f"output_path must end with .jsonl or .parquet, got {file_name!r}")
+    return os.path.join(settings.EXPERIMENTS_DIR, file_name)
+
+
+def _ingest(document, chunking_strategy, embedding_provider=None, embedding_model=None):
+    """
+    Process one (document, chunking strategy) pair and time it.
+    """
+    timings = {}
+    try:
+        with timed(timings, "ingest_s"):
+            chunks, vector_store = load_or_build_index(document, chunking_strategy,
+                                                       embedding_provider=embedding_provider,
+                                                       embedding_model=embedding_model)
+    except Exception as e:
+        logger.error("Experiment ingestion failed", document=document, chunking_strategy=chunking_strategy,
+                     error=str(e))
+        return {"error": str(e), "ingest_s": timings["ingest_s"]}
+    return {"chunks": chunks, "vector_store": vector_store, "ingest_s": timings["ingest_s"], "error": None}
+
+
+def _run_query(job, ingestion, query, query_embedding, retriever, reference_answer):
+    """
+    Run retrieval and generation for a single grid cell and build its result row.
+    """
+    document, chunking_strategy, search_type, k = job
+    timings, context_stats = {}, {}
+    row = {
+        "document": document,
+        "chunking_strategy": chunking_strategy,
+        "search_type": search_type,
+        "k": k,
+        "query": query,
+        "reference_answer": reference_answer,
+        # Answers are scored in the space of the index they were retrieved from
+        "embedding_space": ingestion["vector_store"].embedding_space if ingestion["error"] is None else None,
+    }
+    try:
+        if ingestion["error"] is not None:
+            raise RuntimeError(f"Ingestion failed: {ingestion['error']}")
+        if search_type == "standard":
+            docs, response = run_standard_query(query, ingestion["vector_store"], k, query_embedding, timings,
+                                                context_stats=context_stats)
+            row["retrieved_chunk_ids"] = [doc["metadata"].get("index") for doc in docs]
+            chunk_metadata = [doc["metadata"] for doc in docs]
+        else:
+            docs, response = run_hybrid_query(query, retriever, timings, context_stats)
+            row["retrieved_chunk_ids"] = [doc.metadata.get("chunk") for doc in docs]
+            chunk_metadata = [doc.metadata for doc in docs]
+        # Offsets in the document text, comparable across chunking strategies
+        row["retrieved_spans"] = [[metadata.get("start"), metadata.get("end")] for metadata in chunk_metadata]
+        row["response"] = response
+        row["error"] = None
+    except Exception as e:
+        logger.error("Experiment query failed", document=document, chunking_strategy=chunking_strategy,
+                     search_type=search_type, k=k, error=str(e))
+        row["response"] = None
+        row["retrieved_chunk_ids"] = []
+        row["retrieved_spans"] = []
+        row["error"] = str(e)
+    row["ingest_s"] = ingestion["ingest_s"]
+    row.update(timings)
+    row.update({f"context_{name}": value for name, value in context_stats.items()})
+    return row
+
+
+def _evaluate(rows, output_path, gold_spans, embedding_provider, embedding_model, timings):
+    """
+    Score all result rows in one batch and write the aggregate table next to the results.
+
+    A failed evaluation is logged rather than raised, so the run's results are still reported.
+    """
+    evaluation_path = f"{os.path.splitext(output_path)[0]}_evaluation.csv"
+    try:
+        with timed(timings, "evaluation_s"):
+            table = aggregate(evaluate_rows(rows, gold_spans, embedding_provider, embedding_model),
+                              group_by=("chunking_strategy", "search_type", "k"))
+            table.to_csv(evaluation_path, index=False)
+    except Exception as e:
+        logger.error("Experiment evaluation failed", output_path=output_path, error=str(e))
+        return {"evaluation_error": str(e)}
+    # NaN means are not valid JSON
+    records = table.astype(object).where(table.notna(), None).to_dict("records")
+    return {"evaluation_path": evaluation_path, "evaluation": records}
+
+
+def run_experiments(documents, questions, chunking_strategies=("fixed",), search_types=("standard",),
+                    k_values=(4,), reference_answers=None, output_path="data/experiments/results.jsonl",
+                    max_workers=8, embedding_provider=None, embedding_model=None, gold_spans=None):
+    """
+    Run every question over a grid of documents, chunking strategies, search types and k values.
+
+    Each (document, chunking strategy) pair is ingested once and every query is embedded once; the
+    retrieval and generation calls of the whole grid then run in parallel with bounded concurrency.
+    Result rows are streamed to `output_path` (JSONL, or Parquet for a `.parquet` path) as they finish.
+    With reference answers or gold spans, every response is then scored in one batch and the
+    mean scores per chunking strategy, search type and k are written next to it as
+    `<output>_evaluation.csv`. Failed rows are left out of the means.
+
+    Args:
+        documents (List[str]): Paths to PDF documents
+        questions (List[str]): Questions asked against every document
+        chunking_strategies (List[str]): Chunking strategies to compare
+        search_types (List[str]): Search types to compare ('standard' and/or 'hybrid')
+        k_values (List[int]): Numbers of retrieved documents to compare
+        reference_answers (List[str], optional): Reference answers aligned with `questions`
+        output_path (str): File the result rows are written to
+        max_workers (int): Maximum number of concurrent ingestion and query tasks
+        embedding_provider (str, optional): Embedding provider used for the chunks and the queries
+        embedding_model (str, optional): Embedding model of the provider
+        gold_spans (Dict[str, Dict[str, List[Tuple[int, int]]]], optional): Relevant (start, end) spans
+            of the document text per document and question, for hit@k and MRR
+
+    Returns:
+        Dict: Output path, number of rows written, number of failed rows, timings and, when
+            scored, the evaluation table
+    """
+    unknown = set(search_types) - set(SEARCH_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown search types: {sorted(unknown)}")
+
+    reference_answers = reference_answers or []
+    started = time.perf_counter()
+    summary_timings = {}
+
+    logger.info("Starting experiment run", documents=len(documents), questions=len(questions),
+                chunking_strategies=list(chunking_strategies), search_types=list(search_types),
+                k_values=list(k_values))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Ingest each (document, strategy) once and embed all queries in a single batch meanwhile
+        ingestion_futures = {
+            executor.submit(_ingest, document, strategy, embedding_provider, embedding_model): (document, strategy)
+            for document, strategy in product(documents, chunking_strategies)
+        }
+        # Query embeddings are keyed by embedding space; local models are fitted per document, so
+        # their queries can only be embedded once ingestion is done
+        embedder = get_embedding_provider(embedding_provider, embedding_model)
+        query_embeddings = {}
+        if "standard" in search_types and not embedder.requires_fit:
+            with timed(summary_timings, "query_embedding_s"):
+                query_embeddings[embedder.space] = create_embeddings(list(questions), space=embedder.space)
+
+        ingestions = {}
+        with timed(summary_timings, "ingestion_wait_s"):
+            for future in as_completed(ingestion_futures):
+                ingestions[ingestion_futures[future]] = future.result()
+
+        if "standard" in search_types:
+            spaces = {ingestion["vector_store"].embedding_space for ingestion in ingestions.values()
+                      if ingestion["error"] is None}
+            with timed(summary_timings, "query_embedding_s"):
+                for space in spaces - set(query_embeddings):
+                    query_embeddings[space] = create_embeddings(list(questions), space=space)
+
+        # Hybrid retrievers only depend on the document, strategy and k
+        retrievers = {}
+        if "hybrid" in search_types:
+            with timed(summary_timings, "retriever_build_s"):
+                for (document, strategy), ingestion in ingestions.items():
+                    if ingestion["error"] is not None:
+                        continue
+                    for k in k_values:
+                        retrievers[(document, strategy, k)] = build_hybrid_retriever(
+                            ingestion["chunks"], ingestion["vector_store"], k)
+
+        failed = 0
+        scored_rows = []
+        with ResultWriter(output_path) as writer:
+            query_futures = []
+            for job in product(documents, chunking_strategies, search_types, k_values):
+                document, strategy, search_type, k = job
+                ingestion = ingestions[(document, strategy)]
+                space = ingestion["vector_store"].embedding_space if ingestion["error"] is None else None
+                embeddings = query_embeddings.get(space) or [None] * len(questions)
+                for i, (query, query_embedding) in enumerate(zip(questions, embeddings)):
+                    query_futures.append(executor.submit(
+                        _run_query, job, ingestion, query, query_embedding,
+                        retrievers.get((document, strategy, k)),
+                        reference_answers[i] if i < len(reference_answers) else None,
+                    ))
+
+            for future in as_completed(query_futures):
+                row = future.result()
+                failed += row["error"] is not None
+                writer.write(row)
+                scored_rows.append({field: row.get(field) for field in EVALUATION_FIELDS})
+
+    evaluation = None
+    if any(reference_answers) or gold_spans:
+        evaluation = _evaluate(scored_rows, output_path, gold_spans, embedding_provider, embedding_model,
+                               summary_timings)
+
+    summary = {
+        "output_path": output_path,
+        "rows": writer.rows_written,
+        "failed": failed,
+        "elapsed_s": time.perf_counter() - started,
+        **summary_timings,
+    }
+    if evaluation is not None:
+        summary.update(evaluation)
+    logger.info("Finished experiment run", **summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunking strategies and search types over a grid.")
+    parser.add_argument("--documents", nargs="+", required=True, help="Paths to PDF documents")
+    parser.add_argument("--questions", nargs="+", required=True, help="Questions to ask")
+    parser.add_argument("--reference-answers", nargs="*", default=None)
+    parser.add_argument("--chunking-strategies", nargs="+", default=["fixed"])
+    parser.add_argument("--search-types", nargs="+", default=["standard"], choices=SEARCH_TYPES)
+    parser.add_argument("--k-values", nargs="+", type=int, default=[4])
+    parser.add_argument("--output", default="data/experiments/results.jsonl")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--embedding-provider", default=None, help="openai, local-lsa or transformers")
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--gold", default=None,
+                        help="JSON file mapping each document to the relevant [start, end] spans of each question")
+    args = parser.parse_args()
+
+    gold_spans = None
+    if args.gold:
+        with open(args.gold, encoding="utf-8") as f:
+            gold_spans = json.load(f)
+
+    summary = run_experiments(
+        args.documents,
+        args.questions,
+        chunking_strategies=args.chunking_strategies,
+        search_types=args.search_types,
+        k_values=args.k_values,
+        reference_answers=args.reference_answers,
+        output_path=args.output,
+        max_workers=args.max_workers,
+        embedding_provider=args.embedding_provider,
+        embedding_model=args.embedding_model,
+        gold_spans=gold_spans,
+    )
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
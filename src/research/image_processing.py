@@ -1,20 +1,87 @@
 import base64
-import requests
+import io
 import os
-from mistralai import Mistral
-
+from functools import lru_cache
 
+from config.settings import settings
+from services.backends import get_backend
+from utils.disk_cache import DiskCache, make_cache_key
+from utils.hashing import bytes_sha256
 from utils.logger_config import setup_logger
 
 logger = setup_logger(__name__)
 
-def image_summarize(file_path, question, model = "pixtral-12b-2409"):
+JPEG_QUALITIES = (85, 75, 65, 50)
+
+@lru_cache(maxsize=None)
+def _summary_cache():
+    return DiskCache(settings.IMAGE_CACHE_PATH)
+
+def preprocess_image(image_bytes, max_pixels=None, max_bytes=None):
+    """
+    Downsize and recompress an image so it fits a pixel and byte budget.
+
+    Images already within budget are returned unchanged. Larger images are resized and re-encoded
+    as JPEG, or as PNG when they have transparency. Animated GIFs are reduced to their first frame.
+
+    Args:
+        image_bytes (bytes): The original image file content.
+        max_pixels (int, optional): Maximum width * height. Defaults to settings.IMAGE_MAX_PIXELS.
+        max_bytes (int, optional): Target encoded size. Defaults to settings.IMAGE_MAX_BYTES.
+
+    Returns:
+        Tuple[bytes, str]: The image bytes to send and their MIME type.
+    """
+    max_pixels = max_pixels or settings.IMAGE_MAX_PIXELS
+    max_bytes = max_bytes or settings.IMAGE_MAX_BYTES
+    Image = get_backend("pillow")
+
+    image = Image.open(io.BytesIO(image_bytes))
+    mime_type = Image.MIME.get(image.format, "image/jpeg")
+    width, height = image.size
+    if width * height <= max_pixels and len(image_bytes) <= max_bytes:
+        return image_bytes, mime_type
+
+    image.seek(0)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    scale = min(1.0, (max_pixels / (width * height)) ** 0.5)
+    while True:
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        resized = image.resize(size, Image.LANCZOS) if size != image.size else image
+
+        buffer = io.BytesIO()
+        if has_alpha:
+            resized.save(buffer, format="PNG", optimize=True)
+        else:
+            for quality in JPEG_QUALITIES:
+                buffer = io.BytesIO()
+                resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+                if buffer.tell() <= max_bytes:
+                    break
+        # Shrink further only while the byte budget is still exceeded
+        if buffer.tell() <= max_bytes or min(size) <= 64:
+            break
+        scale *= 0.75
+
+    output = buffer.getvalue()
+    logger.info("Image preprocessed", original_size=(width, height), new_size=size,
+                original_bytes=len(image_bytes), new_bytes=len(output))
+    return output, "image/png" if has_alpha else "image/jpeg"
+
+def image_summarize(file_path, question, model = "pixtral-12b-2409", use_cache=True):
     """
     Summarize the content of an image using Mistral's Pixtral model.
+
+    The image is downsized to the configured budget before upload, and answers are cached on
+    (image hash, question, model) so repeated questions do not call the API.
     
     Args:
         file_path (str): Path to the image file.
         question (str): Question to ask about the image.
+        model (str): Vision model to use.
+        use_cache (bool): Whether to read and write the persistent answer cache.
         
     Returns:
         str: Summary of the image content.
@@ -22,9 +89,7 @@ def image_summarize(file_path, question, model = "pixtral-12b-2409"):
     try:
         logger.info(f"Opening image file from path: {file_path}")
         with open(file_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            image_url = f"data:image/jpeg;base64,{base64_image}"
-            logger.info("Image file successfully encoded to base64.")
+            original_bytes = image_file.read()
     except FileNotFoundError:
         logger.error("Error: The specified image file was not found.")
         return "Error: The specified image file was not found."
@@ -32,6 +97,22 @@ def image_summarize(file_path, question, model = "pixtral-12b-2409"):
         logger.error(f"Error: {e}")
         return f"Error: {e}"
 
+    cache_key = make_cache_key(bytes_sha256(original_bytes), question, model)
+    if use_cache:
+        cached_summary = _summary_cache().get(cache_key)
+        if cached_summary is not None:
+            logger.info("Image summary served from cache.")
+            return cached_summary
+
+    try:
+        image_bytes, mime_type = preprocess_image(original_bytes)
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        image_url = f"data:{mime_type};base64,{base64_image}"
+        logger.info("Image file successfully encoded to base64.")
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return f"Error: {e}"
+
     # Retrieve the API key from environment variables
     try:
         api_key = os.environ["MISTRAL_API_KEY"]
@@ -41,7 +122,7 @@ def image_summarize(file_path, question, model = "pixtral-12b-2409"):
         return "Error: MISTRAL_API_KEY environment variable not set."
 
     # Initialize the Mistral client
-    client = Mistral(api_key=api_key)
+    client = get_backend("mistral")(api_key=api_key)
     logger.info("Mistral client initialized.")
 
     # Define the messages for the chat
@@ -60,7 +141,7 @@ def image_summarize(file_path, question, model = "pixtral-12b-2409"):
             ]
         }
     ]
-    logger.info(f"Messages prepared for the chat: {messages}")
+    logger.debug("Messages prepared for the chat", question=question, image_base64_length=len(base64_image))
 
     # Get the chat response
     try:
@@ -73,4 +154,7 @@ def image_summarize(file_path, question, model = "pixtral-12b-2409"):
         logger.error(f"Error while getting chat response: {e}")
         return f"Error: {e}"
 
-    return chat_response.choices[0].message.content
\ No newline at end of file
+    summary = chat_response.choices[0].message.content
+    if use_cache:
+        _summary_cache().set(cache_key, summary)
+    return summary
\ No newline at end of file
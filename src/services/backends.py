@@ -0,0 +1,138 @@
+import importlib
+import threading
+
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_loaders = {}
+_instances = {}
+_lock = threading.RLock()
+
+
+def register_backend(name, loader):
+    """
+    Register a loader for a heavy backend without importing it.
+
+    Args:
+        name (str): Name the backend is requested under.
+        loader (callable): Zero-argument function that imports and returns the backend.
+    """
+    with _lock:
+        _loaders[name] = loader
+        _instances.pop(name, None)
+
+
+def get_backend(name):
+    """
+    Return a backend, loading it on first use.
+
+    Args:
+        name (str): Name of a registered backend.
+
+    Returns:
+        Any: The loaded backend (module, class, client or namespace of classes).
+    """
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+
+    with _lock:
+        if name not in _instances:
+            if name not in _loaders:
+                raise KeyError(f"Unknown backend: {name}")
+            logger.info("Loading backend", backend=name)
+            _instances[name] = _loaders[name]()
+        return _instances[name]
+
+
+def is_loaded(name):
+    """
+    Check whether a backend has already been loaded.
+    """
+    return name in _instances
+
+
+def warm_up(names=None):
+    """
+    Load backends eagerly, e.g. at startup for latency-sensitive deployments.
+
+    Args:
+        names (List[str], optional): Backends to load. Defaults to every registered backend.
+
+    Returns:
+        List[str]: Names of the backends that were loaded.
+    """
+    names = list(names or _loaders)
+    for name in names:
+        get_backend(name)
+    logger.info("Backends warmed up", backends=names)
+    return names
+
+
+def _import_attributes(module_name, *attributes):
+    """
+    Build a loader that imports `module_name` and returns the requested attributes as a dict.
+    """
+    def loader():
+        module = importlib.import_module(module_name)
+        return {attribute: getattr(module, attribute) for attribute in attributes}
+    return loader
+
+
+def _load_langchain():
+    """
+    Import the langchain components used by hybrid search.
+    """
+    components = {}
+    components.update(_import_attributes("langchain.retrievers", "BM25Retriever", "EnsembleRetriever")())
+    components.update(_import_attributes("langchain.vectorstores", "FAISS", "Chroma")())
+    components.update(_import_attributes("langchain_core.embeddings", "Embeddings")())
+    components.update(_import_attributes("langchain.schema", "Document")())
+    return components
+
+
+def _load_mistral():
+    """
+    Import the Mistral client class, or its offline stand-in when USE_FAKE_MISTRAL is set.
+    """
+    from config.settings import settings
+    if settings.USE_FAKE_MISTRAL:
+        return importlib.import_module("integration.fake_services").FakeMistral
+    return importlib.import_module("mistralai").Mistral
+
+
+def _load_openai_client():
+    """
+    Build the shared OpenAI client.
+    """
+    from config.settings import settings
+    return settings.openai_client
+
+
+register_backend("openai_client", _load_openai_client)
+register_backend("langchain", _load_langchain)
+register_backend("mistral", _load_mistral)
+register_backend("pymupdf", lambda: importlib.import_module("fitz"))
+register_backend("tiktoken", lambda: importlib.import_module("tiktoken"))
+register_backend("pillow", lambda: importlib.import_module("PIL.Image"))
+register_backend("requests_cache", lambda: importlib.import_module("requests_cache"))
+register_backend("lxml_html", lambda: importlib.import_module("lxml.html"))
+register_backend("joblib", lambda: importlib.import_module("joblib"))
+register_backend("torch", lambda: importlib.import_module("torch"))
+register_backend("transformers", _import_attributes("transformers", "AutoTokenizer", "AutoModel"))
+register_backend(
+    "sklearn_text",
+    lambda: {
+        **_import_attributes("sklearn.feature_extraction.text", "CountVectorizer", "TfidfVectorizer")(),
+        **_import_attributes("sklearn.decomposition", "TruncatedSVD")(),
+    },
+)
+register_backend(
+    "html_tools",
+    lambda: {
+        **_import_attributes("bs4", "BeautifulSoup")(),
+        **_import_attributes("html2text", "HTML2Text")(),
+    },
+)
@@ -1,7 +1,9 @@
-import fitz
-import requests
-from bs4 import BeautifulSoup
-import html2text
+import os
+import tempfile
+
+from services.backends import get_backend
+from services.html_extractors import element_to_html, extract_article
+from services.http_client import fetch
 from utils.logger_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -18,7 +20,7 @@ def extract_text_from_pdf(pdf_path):
     """
     # Open the PDF file
     try: 
-        mypdf = fitz.open(pdf_path)
+        mypdf = get_backend("pymupdf").open(pdf_path)
         all_text = ""  # Initialize an empty string to store the extracted text
 
         # Iterate through each page in the PDF
@@ -32,6 +34,46 @@ def extract_text_from_pdf(pdf_path):
         logger.error("An error occurred while extracting text from PDF")
         raise e
 
+def extract_pdf_structure(pdf_path, max_heading_level=2):
+    """
+    Extracts the text of a PDF file with its page boundaries and the positions of its outline headings.
+
+    Headings come from the PDF's outline (table of contents); each is located in the text of its page,
+    or placed at the start of the page when its title cannot be found there.
+
+    Args:
+    pdf_path (str): Path to the PDF file.
+    max_heading_level (int): Deepest outline level kept, e.g. 2 for sections and subsections.
+
+    Returns:
+    Tuple[str, List[int], List[Tuple[int, str]]]: The text, the offset at which each page starts, and
+        the (offset, title) of each heading in document order.
+    """
+    try:
+        mypdf = get_backend("pymupdf").open(pdf_path)
+        pages = [mypdf[page_num].get_text("text") for page_num in range(mypdf.page_count)]
+        page_starts = []
+        offset = 0
+        for page_text in pages:
+            page_starts.append(offset)
+            offset += len(page_text)
+        text = "".join(pages)
+
+        headings = []
+        for level, title, page_number in mypdf.get_toc():
+            title = title.strip()
+            if level > max_heading_level or not title or not 1 <= page_number <= len(pages):
+                continue
+            page_start = page_starts[page_number - 1]
+            search_from = max(page_start, headings[-1][0] if headings else 0)
+            found = text.find(title, search_from, page_start + len(pages[page_number - 1]))
+            headings.append((found if found != -1 else page_start, title))
+        headings.sort(key=lambda heading: heading[0])
+        return text, page_starts, headings
+    except Exception as e:
+        logger.error("An error occurred while extracting text from PDF")
+        raise e
+
 def chunk_text(text, n, overlap):
     """
     Chunks the given text into segments of n characters with overlap.
@@ -58,43 +100,76 @@ def chunk_text(text, n, overlap):
         logger.error("An error occurred while chunking the text: %s", e)
         raise e
     
+def atomic_write_text(path, text):
+    """
+    Write a text file atomically, so readers never see a partially written file.
+
+    Args:
+    path (str): Destination path.
+    text (str): Content to write.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def html_to_markdown(html_content, url=None):
+    """
+    Converts the HTML of an article page into plain text format.
+
+    Args:
+        html_content (bytes or str): The HTML of the page.
+        url (str, optional): The URL of the page, used to pick the site-specific extractor.
+
+    Returns:
+        str: The title and main body content of the page, or None if the body could not be identified.
+    """
+    # Parse the page and select only the title and the article body
+    title, article_body = extract_article(html_content, url)
+
+    if article_body is not None:
+        # Convert the HTML content to Markdown
+        markdown_converter = get_backend("html_tools")["HTML2Text"]()
+        markdown_converter.ignore_links = False  # Keep links in the Markdown
+        markdown_content = markdown_converter.handle(element_to_html(article_body))
+
+        # Remove newlines and extra spaces from the Markdown content
+        plain_text_content = " ".join(markdown_content.split())
+
+        return f"{title} - {plain_text_content}"
+    else:
+        logger.warning("Could not find the article body in the HTML", url=url)
+        return None
+
 def process_html_to_markdown(URL):
     """
     Converts the content of a webpage at the specified URL into plain text format.
 
+    Pages are fetched through the shared cached HTTP session, so unchanged pages are revalidated
+    with a conditional GET instead of being downloaded again.
+
     Args:
         URL (str): The URL of the webpage to be converted.
 
     Returns:
-        str: The plain text content of the webpage, including the title
-             and main body content if identified, or an error message if extraction fails.
+        str: The plain text content of the webpage, including the title and main body content,
+             or None if the page could not be fetched or its body could not be identified.
     """
+    import requests
+
     try:
         # Fetch the HTML content
-        response = requests.get(URL)
-        logger.info(f'logger.info(f"Fetching HTML content from URL:{response}")')
+        response = fetch(URL)
+        logger.info("Fetched HTML content", url=URL, status=response.status_code,
+                    from_cache=getattr(response, "from_cache", False), sampled=True)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
-        # Parse the HTML content
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Extract the title
-        title = soup.find("title").get_text()
-
-        # Extract the main article content
-        article_body = soup.find("div", {"class": "article-body-commercial-selector"})
-        if article_body:
-            # Convert the HTML content to Markdown
-            markdown_converter = html2text.HTML2Text()
-            markdown_converter.ignore_links = False  # Keep links in the Markdown
-            markdown_content = markdown_converter.handle(str(article_body))
-
-            # Remove newlines and extra spaces from the Markdown content
-            plain_text_content = " ".join(markdown_content.split())
-
-            return f"{title} - {plain_text_content}"
-        else:
-            return "Could not find the article body in the HTML."
+        return html_to_markdown(response.content, URL)
     except requests.RequestException as e:
         logger.error("An error occurred while fetching the URL: %s", str(e))
-        return f"Failed to fetch the URL. Error: {str(e)}"
+        return None
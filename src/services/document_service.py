@@ -1,52 +1,263 @@
-from services.data_utils import extract_text_from_pdf, chunk_text
+import re
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from services.data_utils import extract_pdf_structure, chunk_text
 from research.chunking_strategies import fixed_size_chunking, semantic_chunking, structure_based_chunking
+from config.settings import settings
+from services.embedding_providers import get_embedding_provider
 from services.embedding_service import create_embeddings
+from services.figure_extraction import extract_figures_from_pdf, index_figures, summarize_figures
+from services.shared_index import MappedVectorStore, open_shared_index, publish_index
+from services.sharded_store import ShardedVectorStore
 from services.vector_store import SimpleVectorStore
+from utils.disk_cache import make_cache_key
+from utils.hashing import file_sha256
 from utils.logger_config import setup_logger
+from utils.single_flight import SingleFlight
+from utils.timing import timed
 
 # Set up logger for this module
 logger = setup_logger(__name__)
 
-def process_document(pdf_path, chunking_strategy, chunk_size=1000, chunk_overlap=200):
+_ingestions = SingleFlight("ingestion")
+
+def locate_chunks(text, chunks):
+    """
+    Find the character offsets of each chunk in the source text.
+
+    Chunks are searched for in order, so overlapping chunks are located correctly. Chunks whose
+    whitespace was normalised by the chunking strategy (e.g. sentences joined by single spaces) are
+    matched with any whitespace between their words; chunks that still cannot be found get `None`
+    offsets.
+
+    Args:
+    text (str): The text the chunks were created from.
+    chunks (List[str]): The chunks, in document order.
+
+    Returns:
+    List[Tuple[int, int]]: (start, end) offsets of each chunk.
+    """
+    offsets = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        end = start + len(chunk)
+        if start == -1 and chunk.split():
+            match = re.compile(r"\s+".join(map(re.escape, chunk.split()))).search(text, cursor)
+            if match:
+                start, end = match.span()
+        if start == -1:
+            offsets.append((None, None))
+            continue
+        offsets.append((start, end))
+        cursor = start + 1
+    return offsets
+
+def structure_metadata(start, page_starts, headings):
+    """
+    Describe where a chunk sits in the document: its page and the outline section it starts in.
+
+    Args:
+    start (int or None): Offset of the chunk in the document text.
+    page_starts (List[int]): Offset at which each page starts.
+    headings (List[Tuple[int, str]]): (offset, title) of each heading, in document order.
+
+    Returns:
+    Dict: "page" (1-based) and, after the first heading, "section" and "section_start"; empty for
+        chunks that could not be located.
+    """
+    if start is None:
+        return {}
+    metadata = {"page": max(1, bisect_right(page_starts, start))}
+    heading = bisect_right([offset for offset, _ in headings], start) - 1
+    if heading >= 0:
+        metadata["section_start"], metadata["section"] = headings[heading]
+    return metadata
+
+def process_document(pdf_path, chunking_strategy, chunk_size=1000, chunk_overlap=200, include_figures=False,
+                     embedding_provider=None, embedding_model=None):
     """
     Process a document for use with adaptive retrieval.
 
+    Figures whose summary fails are left out of the store, with a warning.
+
+    Args:
+    pdf_path (str): Path to the PDF file.
+    chunk_size (int): Size of each chunk in characters.
+    chunk_overlap (int): Overlap between chunks in characters.
+    include_figures (bool): Also summarize the figures embedded in the PDF and index the summaries.
+    embedding_provider (str, optional): Embedding provider. Defaults to settings.EMBEDDING_PROVIDER.
+    embedding_model (str, optional): Embedding model. Defaults to the provider's default model.
+
+    Returns:
+    Tuple[List[str], SimpleVectorStore]: Document chunks (figure summaries last) and vector store.
+    """
+    chunks, store, _ = _process_document(pdf_path, chunking_strategy, chunk_size, chunk_overlap, include_figures,
+                                         embedding_provider, embedding_model)
+    return chunks, store
+
+def _process_document(pdf_path, chunking_strategy, chunk_size=1000, chunk_overlap=200, include_figures=False,
+                      embedding_provider=None, embedding_model=None):
+    """
+    Process a document as process_document does, also returning how many figures were skipped
+    because their summary failed.
+    """
+    figures_skipped = 0
+    figure_executor = figures_future = None
+    if include_figures:
+        # Figure summaries are generated in the background while the text is chunked and embedded
+        with timed(None, "extract_figures_s"):
+            figures = extract_figures_from_pdf(pdf_path)
+        figure_executor = ThreadPoolExecutor(max_workers=1)
+        figures_future = figure_executor.submit(summarize_figures, figures)
+
+    try:
+        # Extract text from the PDF file
+        logger.info("Extracting text from PDF...")
+        with timed(None, "extract_s"):
+            extracted_text, page_starts, headings = extract_pdf_structure(pdf_path)
+
+        # Chunk the extracted text
+        logger.info("Chunking text...")
+        with timed(None, "chunk_s"):
+            if chunking_strategy == "fixed":
+                chunks = fixed_size_chunking(extracted_text, chunk_size, chunk_overlap)
+            elif chunking_strategy == 'semantic':
+                chunks = semantic_chunking(extracted_text)
+            elif chunking_strategy == 'structure_based':
+                chunks = structure_based_chunking(extracted_text)
+            else:
+                raise ValueError(f"Unknown chunking strategy: {chunking_strategy}")
+        logger.info(f"Created {len(chunks)} text chunks")
+
+        # Create embeddings for the text chunks; local models are fitted on this document's chunks
+        embedder = get_embedding_provider(embedding_provider, embedding_model)
+        with timed(None, "embed_chunks_s"):
+            embedding_space = embedder.fit(chunks)
+            chunk_embeddings = create_embeddings(chunks, space=embedding_space)
+
+        # Initialize the vector store
+        store = SimpleVectorStore(embedding_space)
+
+        # Source offsets let overlapping chunks be merged again when the context is assembled
+        if chunking_strategy == "fixed":
+            step = chunk_size - chunk_overlap
+            offsets = [(i * step, i * step + len(chunk)) for i, chunk in enumerate(chunks)]
+        else:
+            offsets = locate_chunks(extracted_text, chunks)
+
+        # Add each chunk and its embedding to the vector store with metadata; the page and outline
+        # section let large indexes be searched section by section
+        for i, (chunk, embedding, (start, end)) in enumerate(zip(chunks, chunk_embeddings, offsets)):
+            store.add_item(
+                text=chunk,
+                embedding=embedding,
+                metadata={"index": i, "source": pdf_path, "start": start, "end": end,
+                          **structure_metadata(start, page_starts, headings)}
+            )
+
+        logger.info(f"Added {len(chunks)} chunks to the vector store")
+
+        if figures_future is not None:
+            with timed(None, "figures_s"):
+                summaries = figures_future.result()
+                chunks = chunks + index_figures(store, pdf_path, figures, summaries)
+            figures_skipped = summaries.count(None)
+            if figures_skipped:
+                logger.warning("Figures skipped: their summaries failed", pdf_path=pdf_path,
+                               skipped=figures_skipped, figures=len(figures))
+    finally:
+        if figure_executor is not None:
+            # On failure, figures not yet summarized are dropped instead of keeping the thread busy
+            figure_executor.shutdown(wait=False, cancel_futures=True)
+
+    # Return the chunks, the vector store and the number of figures missing from it
+    return chunks, store, figures_skipped
+
+
+def document_index_key(pdf_path, chunking_strategy, chunk_size=1000, chunk_overlap=200, include_figures=False,
+                       embedding_provider=None, embedding_model=None):
+    """
+    Identify the index of a document by its content and everything that changes how it is processed.
+    """
+    embedder = get_embedding_provider(embedding_provider, embedding_model)
+    return make_cache_key(file_sha256(pdf_path), chunking_strategy, chunk_size, chunk_overlap, include_figures,
+                          embedder.name, embedder.model)
+
+def load_or_build_index(pdf_path, chunking_strategy, chunk_size=1000, chunk_overlap=200, include_figures=False,
+                        embedding_provider=None, embedding_model=None):
+    """
+    Return the published, memory-mapped index of a document, processing and publishing it first if needed.
+
+    Every worker process maps the same published files, so a document's embeddings and texts are held
+    in memory once however many workers serve it. With settings.SEARCH_PROCESSES set, large indexes
+    are searched in shards over a pool of processes. Concurrent requests for a document that is not
+    published yet wait for a single ingestion instead of each processing it.
+    An index missing figures whose summary failed is returned without being published, so the next
+    request processes the document again.
+
     Args:
     pdf_path (str): Path to the PDF file.
+    chunking_strategy (str): Chunking strategy.
     chunk_size (int): Size of each chunk in characters.
     chunk_overlap (int): Overlap between chunks in characters.
+    include_figures (bool): Also index summaries of the figures embedded in the PDF.
+    embedding_provider (str, optional): Embedding provider. Defaults to settings.EMBEDDING_PROVIDER.
+    embedding_model (str, optional): Embedding model. Defaults to the provider's default model.
+
+    Returns:
+    Tuple[Sequence[str], SimpleVectorStore]: Document chunks and the read-only vector store, memory-mapped
+        once published.
+    """
+    embedder = get_embedding_provider(embedding_provider, embedding_model)
+    key = document_index_key(pdf_path, chunking_strategy, chunk_size, chunk_overlap, include_figures,
+                             embedding_provider, embedding_model)
+    store_class = ShardedVectorStore if settings.SEARCH_PROCESSES > 0 else MappedVectorStore
+    store = _open_published(key, store_class, embedder)
+    if store is not None:
+        logger.info("Using published index", pdf_path=pdf_path, chunking_strategy=chunking_strategy,
+                    items=len(store.texts))
+        return store.texts, store
+
+    return _ingestions.do(key, _build_and_publish, key, store_class, embedder, pdf_path, chunking_strategy,
+                          chunk_size, chunk_overlap, include_figures, embedding_provider, embedding_model)
+
+def _open_published(key, store_class, embedder):
+    """
+    Return the published index if there is one in an embedding space the embedder still has, else None.
+    """
+    store = open_shared_index(key, store_class)
+    # An index whose embedding space is no longer available (e.g. its local model was deleted) is rebuilt
+    if store is not None and embedder.has_space(store.embedding_space):
+        return store
+    return None
+
+def _build_and_publish(key, store_class, embedder, pdf_path, *process_args):
+    """
+    Process a document and publish its index, unless another ingestion has published it meanwhile.
+
+    Args:
+    key (str): Identifier of the index, from document_index_key.
+    store_class (type): MappedVectorStore or a subclass of it, e.g. ShardedVectorStore.
+    embedder (EmbeddingProvider): Provider the index must be embedded with.
+    pdf_path (str): Path to the PDF file.
+    *process_args: Remaining arguments of process_document, after `pdf_path`.
 
     Returns:
-    Tuple[List[str], SimpleVectorStore]: Document chunks and vector store.
-    """
-    # Extract text from the PDF file
-    logger.info("Extracting text from PDF...")
-    extracted_text = extract_text_from_pdf(pdf_path)
-
-    # Chunk the extracted text
-    logger.info("Chunking text...")
-    if chunking_strategy == "fixed":
-        chunks = fixed_size_chunking(extracted_text, chunk_size, chunk_overlap)
-    elif chunking_strategy == 'semantic':
-        chunks = semantic_chunking(extracted_text)
-    elif chunking_strategy == 'structure_based':
-        chunks = structure_based_chunking(extracted_text)
-    logger.info(f"Created {len(chunks)} text chunks")
-    
-    # Create embeddings for the text chunks
-    chunk_embeddings = create_embeddings(chunks)
-    
-    # Initialize the vector store
-    store = SimpleVectorStore()
-    
-    # Add each chunk and its embedding to the vector store with metadata
-    for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
-        store.add_item(
-            text=chunk,
-            embedding=embedding,
-            metadata={"index": i, "source": pdf_path}
-        )
-    
-    logger.info(f"Added {len(chunks)} chunks to the vector store")
-    # Return the chunks and the vector store
-    return chunks, store
\ No newline at end of file
+    Tuple[Sequence[str], SimpleVectorStore]: Document chunks and the vector store, memory-mapped once
+        published.
+    """
+    # Another ingestion (e.g. in another worker process, or one that finished just before this call
+    # joined) may have published the index since it was last checked
+    store = _open_published(key, store_class, embedder)
+    if store is None:
+        _, store, figures_skipped = _process_document(pdf_path, *process_args)
+        if figures_skipped:
+            # The key promises the figures: serve this index, but leave it unpublished so the next
+            # request processes the document again
+            logger.warning("Index not published: figures are missing", pdf_path=pdf_path, skipped=figures_skipped)
+            return store.texts, store
+        publish_index(key, store)
+        store = open_shared_index(key, store_class)
+    return store.texts, store
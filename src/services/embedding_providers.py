@@ -0,0 +1,296 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from config.settings import settings
+from services.backends import get_backend
+from utils.file_lock import exclusive_file_lock
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_providers = {}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_provider(cls):
+    """
+    Register an embedding provider class under its `name`.
+    """
+    _providers[cls.name] = cls
+    return cls
+
+
+def parse_space(embedding_space):
+    """
+    Split an embedding space tag ("provider:model" or "provider:model@fit") into provider and model.
+    """
+    provider, _, model = embedding_space.partition(":")
+    return provider, model.split("@", 1)[0] or None
+
+
+class EmbeddingProvider:
+    """
+    Base class of the embedding providers.
+
+    Every provider tags the vectors it produces with an embedding space, "<provider>:<model>", so
+    vectors from different models are never compared with each other. Providers that are fitted on
+    a corpus (`requires_fit`) add the id of the fit: "<provider>:<model>@<fit>".
+    """
+    name = None
+    default_model = None
+    requires_fit = False
+
+    def __init__(self, model=None):
+        self.model = model or self.default_model
+
+    @property
+    def space(self):
+        return f"{self.name}:{self.model}"
+
+    def has_space(self, embedding_space):
+        """
+        Whether the provider can embed texts in `embedding_space`.
+        """
+        return embedding_space == self.space
+
+    def fit(self, texts, persist=True):
+        """
+        Prepare the provider on a corpus. Pre-trained models have nothing to fit.
+
+        Args:
+        texts (List[str]): Corpus the vectors will be compared within, e.g. the chunks of an index.
+        persist (bool): Save the fitted model so other processes and later runs can use it.
+
+        Returns:
+        str: Embedding space to embed the corpus and its queries in.
+        """
+        return self.space
+
+    def discard(self, embedding_space):
+        """
+        Delete the model fitted for a space that is no longer used. Pre-trained models keep nothing.
+        """
+
+    def embed(self, texts, embedding_space=None):
+        """
+        Embed a list of texts.
+
+        Args:
+        texts (List[str]): Texts to embed.
+        embedding_space (str, optional): Space returned by `fit`, for providers that require one.
+
+        Returns:
+        List[List[float]]: One vector per text.
+        """
+        raise NotImplementedError
+
+
+@register_provider
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from the OpenAI API (or any OpenAI-compatible server set in OPENAI_BASE_URL).
+    """
+    name = "openai"
+    default_model = "text-embedding-3-small"
+
+    def embed(self, texts, embedding_space=None):
+        response = get_backend("openai_client").embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+
+@register_provider
+class LocalLSAEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU-only latent semantic analysis embeddings: TF-IDF weighted word and bigram counts projected
+    by a truncated SVD.
+
+    A model is fitted per corpus (the chunks of one index), so each index is embedded in its own
+    vocabulary. The fit id is a hash of the corpus and the settings, so every process fitting the
+    same corpus arrives at the same space. Fitted models are persisted to LOCAL_EMBEDDING_DIR, one
+    file per fit, and loaded on demand by the processes embedding queries in that space.
+    """
+    name = "local-lsa"
+    default_model = "default"
+    requires_fit = True
+    max_features = 2 ** 16
+    # Fitted models kept in memory per process
+    max_loaded_models = 16
+
+    def __init__(self, model=None):
+        super().__init__(model)
+        self._models = {}  # fit id -> (vectorizer, projection)
+        self._lock = threading.Lock()
+
+    @property
+    def space(self):
+        raise ValueError(f"Local embedding model '{self.model}' is fitted per corpus; "
+                         "embed in the space returned by fit, e.g. a vector store's embedding space")
+
+    def _path(self, fit_id):
+        return os.path.join(settings.LOCAL_EMBEDDING_DIR, f"lsa-{self.model}-{fit_id}.joblib")
+
+    def _fit_id(self, embedding_space):
+        fit_id = (embedding_space or "").partition("@")[2]
+        if not fit_id or parse_space(embedding_space) != (self.name, self.model):
+            raise ValueError(f"Embedding space {embedding_space} is not a {self.name}:{self.model} fit")
+        return fit_id
+
+    def has_space(self, embedding_space):
+        try:
+            fit_id = self._fit_id(embedding_space)
+        except ValueError:
+            return False
+        with self._lock:
+            return fit_id in self._models or os.path.exists(self._path(fit_id))
+
+    def _remember(self, fit_id, model):
+        if fit_id not in self._models and len(self._models) >= self.max_loaded_models:
+            # Forget the least recently fitted or loaded model; it is reloaded from disk if needed
+            self._models.pop(next(iter(self._models)))
+        self._models[fit_id] = model
+        return model
+
+    def _model(self, fit_id):
+        with self._lock:
+            model = self._models.get(fit_id)
+            if model is None:
+                if not os.path.exists(self._path(fit_id)):
+                    raise ValueError(f"Local embedding model '{self.model}@{fit_id}' is not available")
+                saved = get_backend("joblib").load(self._path(fit_id))
+                model = self._remember(fit_id, (saved["vectorizer"], saved["projection"]))
+                logger.info("Loaded local embedding model", path=self._path(fit_id), fit_id=fit_id)
+            return model
+
+    def _train(self, texts):
+        sklearn = get_backend("sklearn_text")
+        vectorizer = sklearn["TfidfVectorizer"](ngram_range=(1, 2), stop_words="english", sublinear_tf=True,
+                                                max_features=self.max_features, dtype=np.float32)
+        term_matrix = vectorizer.fit_transform(texts)
+        n_components = max(1, min(settings.LOCAL_EMBEDDING_DIMENSIONS, min(term_matrix.shape) - 1))
+        svd = sklearn["TruncatedSVD"](n_components=n_components, random_state=0).fit(term_matrix)
+        # A C-ordered copy of the components makes the sparse projection of a query sub-millisecond
+        return vectorizer, np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+
+    def fit(self, texts, persist=True):
+        """
+        Fit a model on `texts`, or reuse the model already fitted on the same corpus.
+
+        Concurrent fits of the same corpus in several processes are serialised by a file lock, so
+        the model is trained once and written atomically.
+        """
+        digest = hashlib.sha1(f"{settings.LOCAL_EMBEDDING_DIMENSIONS}:{self.max_features}".encode("utf-8"))
+        for text in texts:
+            digest.update(b"\x00" + text.encode("utf-8"))
+        fit_id = digest.hexdigest()[:12]
+        embedding_space = f"{self.name}:{self.model}@{fit_id}"
+
+        with self._lock:
+            if fit_id in self._models:
+                return embedding_space
+        if not persist:
+            model = self._train(texts)
+            with self._lock:
+                self._remember(fit_id, model)
+            return embedding_space
+
+        path = self._path(fit_id)
+        with exclusive_file_lock(f"{path}.lock"):
+            if os.path.exists(path):
+                self._model(fit_id)
+                return embedding_space
+            vectorizer, projection = self._train(texts)
+            fd, tmp_path = tempfile.mkstemp(dir=settings.LOCAL_EMBEDDING_DIR, prefix=".tmp-")
+            os.close(fd)
+            try:
+                get_backend("joblib").dump({"vectorizer": vectorizer, "projection": projection, "fit_id": fit_id},
+                                           tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        with self._lock:
+            self._remember(fit_id, (vectorizer, projection))
+        logger.info("Fitted local embedding model", path=path, fit_id=fit_id, texts=len(texts),
+                    dimensions=projection.shape[1])
+        return embedding_space
+
+    def discard(self, embedding_space):
+        fit_id = self._fit_id(embedding_space)
+        with self._lock:
+            self._models.pop(fit_id, None)
+            if os.path.exists(self._path(fit_id)):
+                os.remove(self._path(fit_id))
+        logger.info("Discarded local embedding model", fit_id=fit_id)
+
+    def embed(self, texts, embedding_space=None):
+        vectorizer, projection = self._model(self._fit_id(embedding_space))
+        vectors = vectorizer.transform(texts) @ projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+@register_provider
+class TransformersEmbeddingProvider(EmbeddingProvider):
+    """
+    Mean-pooled sentence embeddings from a transformers model already present in the local
+    Hugging Face cache; nothing is downloaded.
+    """
+    name = "transformers"
+    default_model = "sentence-transformers/all-MiniLM-L6-v2"
+    batch_size = 32
+
+    def __init__(self, model=None):
+        super().__init__(model)
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                transformers = get_backend("transformers")
+                self._tokenizer = transformers["AutoTokenizer"].from_pretrained(self.model, local_files_only=True)
+                self._model = transformers["AutoModel"].from_pretrained(self.model, local_files_only=True).eval()
+                logger.info("Loaded local transformers model", model=self.model)
+        return self._tokenizer, self._model
+
+    def embed(self, texts, embedding_space=None):
+        torch = get_backend("torch")
+        tokenizer, model = self._load()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                return_tensors="pt")
+            with torch.inference_mode():
+                hidden = model(**encoded).last_hidden_state
+            mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.extend(torch.nn.functional.normalize(pooled, dim=1).tolist())
+        return vectors
+
+
+def get_embedding_provider(provider=None, model=None):
+    """
+    Return the shared instance of an embedding provider.
+
+    Args:
+    provider (str, optional): "openai", "local-lsa" or "transformers". Defaults to settings.EMBEDDING_PROVIDER.
+    model (str, optional): Model of the provider. Defaults to the provider's default model.
+
+    Returns:
+    EmbeddingProvider: The provider.
+    """
+    provider = provider or settings.EMBEDDING_PROVIDER
+    if provider not in _providers:
+        raise ValueError(f"Unknown embedding provider: {provider}. Options: {sorted(_providers)}")
+    key = (provider, model or _providers[provider].default_model)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = _providers[provider](key[1])
+        return _instances[key]
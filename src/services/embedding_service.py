@@ -1,17 +1,16 @@
-from dotenv import load_dotenv 
+from services.embedding_providers import get_embedding_provider, parse_space
 from utils.logger_config import setup_logger
-from config.settings import settings
+from utils.single_flight import SingleFlight
 logger = setup_logger(__name__)
 
-load_dotenv()
-client = settings.openai_client
+_embedding_calls = SingleFlight("embeddings")
 
 
-def create_embeddings(text, model="text-embedding-3-small"):
+def create_embeddings(text, model=None, provider=None, space=None):
 
     """
-    RESEARCH AREA: What is the best embedding model? What are the differences is there any papers that are most recently published/most cited that 
-    cover this area. 
+    RESEARCH AREA: What is the best embedding model? What are the differences is there any papers that are most recently published/most cited that
+    cover this area.
     - Take a look at this paper: https://arxiv.org/html/2406.01607v2
 
 
@@ -19,30 +18,39 @@ def create_embeddings(text, model="text-embedding-3-small"):
 
     Args:
     text (str or List[str]): The input text(s) for which embeddings are to be created.
-    model (str): The model to be used for creating embeddings.
+    model (str, optional): The model to be used for creating embeddings. Defaults to the provider's default.
+    provider (str, optional): Embedding provider ("openai", "local-lsa" or "transformers").
+        Defaults to settings.EMBEDDING_PROVIDER.
+    space (str, optional): Embedding space of a vector store the embeddings are compared with;
+        overrides `provider` and `model`. Required by providers fitted per corpus ("local-lsa").
 
     Returns:
     List[float] or List[List[float]]: The embedding vector(s).
     """
-
-    logger.info("Creating embeddings for text with model: %s", model)
+    if space:
+        provider, model = parse_space(space)
+    embedder = get_embedding_provider(provider, model)
+    if space and not embedder.has_space(space):
+        raise ValueError(f"Embedding space {space} is not available")
+    # Providers fitted per corpus have no default space and raise here
+    space = space or embedder.space
+
+    logger.info("Creating embeddings for text with model: %s", space)
     try:
         # Handle both string and list inputs by converting string input to a list
         input_text = text if isinstance(text, list) else [text]
-        
-        # Create embeddings for the input text using the specified model
-        response = client.embeddings.create(
-            model=model,
-            input=input_text
-        )
-        
+
+        # Create embeddings for the input text using the selected provider; identical concurrent
+        # requests (e.g. the same default question from several users) share one call
+        embeddings = _embedding_calls.do((space, tuple(input_text)), embedder.embed, input_text, space)
+
         # If the input was a single string, return just the first embedding
         if isinstance(text, str):
-            return response.data[0].embedding
-        
+            return embeddings[0]
+
         # Otherwise, return all embeddings for the list of texts
         logger.info("The embeddings where successfully created")
-        return [item.embedding for item in response.data]
+        return embeddings
     except Exception as e:
         logger.error("An error occurred while creating embeddings: %s", e)
-        raise e
\ No newline at end of file
+        raise e
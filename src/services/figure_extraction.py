@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import settings
+from research.image_processing import image_summarize
+from services.backends import get_backend
+from services.embedding_service import create_embeddings
+from utils.hashing import bytes_sha256
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+FIGURE_QUESTION = (
+    "Describe this figure from a research paper. Summarize what it shows, including axes, "
+    "labels, trends and any numbers that can be read from it."
+)
+
+
+def extract_figures_from_pdf(pdf_path, output_dir=None, min_width=100, min_height=100):
+    """
+    Extract the embedded images of a PDF, deduplicated by content hash.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        output_dir (str, optional): Directory the images are written to. Defaults to
+            data/figures/<pdf name>.
+        min_width (int): Images narrower than this (icons, logos, rules) are skipped.
+        min_height (int): Images shorter than this are skipped.
+
+    Returns:
+        List[Dict]: One entry per unique image with its path, hash, size and the pages it appears on.
+    """
+    fitz = get_backend("pymupdf")
+    output_dir = output_dir or os.path.join("data", "figures", os.path.splitext(os.path.basename(pdf_path))[0])
+    os.makedirs(output_dir, exist_ok=True)
+
+    figures = {}
+    with fitz.open(pdf_path) as pdf:
+        for page_number in range(pdf.page_count):
+            for image_info in pdf[page_number].get_images(full=True):
+                xref = image_info[0]
+                try:
+                    extracted = pdf.extract_image(xref)
+                except Exception as e:
+                    logger.warning("Could not extract image", pdf_path=pdf_path, xref=xref, error=str(e))
+                    continue
+                if not extracted or extracted["width"] < min_width or extracted["height"] < min_height:
+                    continue
+
+                image_hash = bytes_sha256(extracted["image"])
+                if image_hash in figures:
+                    if page_number + 1 not in figures[image_hash]["pages"]:
+                        figures[image_hash]["pages"].append(page_number + 1)
+                    continue
+
+                image_path = os.path.join(output_dir, f"{image_hash[:16]}.{extracted['ext']}")
+                if not os.path.exists(image_path):
+                    with open(image_path, "wb") as f:
+                        f.write(extracted["image"])
+                figures[image_hash] = {
+                    "path": image_path,
+                    "hash": image_hash,
+                    "page": page_number + 1,
+                    "pages": [page_number + 1],
+                    "width": extracted["width"],
+                    "height": extracted["height"],
+                }
+
+    logger.info("Extracted figures from PDF", pdf_path=pdf_path, figures=len(figures))
+    return list(figures.values())
+
+
+def summarize_figures(figures, question=FIGURE_QUESTION, model="pixtral-12b-2409", max_workers=None):
+    """
+    Summarize figures concurrently with a bounded pool of vision calls.
+
+    Args:
+        figures (List[Dict]): Figures returned by extract_figures_from_pdf.
+        question (str): Prompt sent with every figure.
+        model (str): Vision model to use.
+        max_workers (int, optional): Maximum concurrent calls. Defaults to settings.FIGURE_SUMMARY_WORKERS.
+
+    Returns:
+        List[str]: Summaries aligned with `figures`; failed figures get None.
+    """
+    max_workers = max_workers or settings.FIGURE_SUMMARY_WORKERS
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        summaries = list(executor.map(lambda figure: image_summarize(figure["path"], question, model), figures))
+
+    # image_summarize reports failures as "Error: ..." strings
+    summaries = [None if not summary or summary.startswith("Error:") else summary for summary in summaries]
+    logger.info("Summarized figures", figures=len(figures), failed=summaries.count(None))
+    return summaries
+
+
+def index_figures(store, pdf_path, figures, summaries, model=None):
+    """
+    Embed figure summaries in one batch and add them to a document's vector store.
+
+    Args:
+        store (SimpleVectorStore): Vector store of the document.
+        pdf_path (str): Path to the PDF the figures come from.
+        figures (List[Dict]): Figures returned by extract_figures_from_pdf.
+        summaries (List[str]): Summaries aligned with `figures`; None entries are skipped.
+        model (str, optional): Embedding model, only used when the store has no embedding space yet.
+
+    Returns:
+        List[str]: The texts that were added to the store.
+    """
+    items = [
+        (figure, f"[Figure on page {figure['page']}] {summary}")
+        for figure, summary in zip(figures, summaries) if summary
+    ]
+    if not items:
+        return []
+
+    # Summaries are embedded in the same space as the document's chunks
+    embeddings = create_embeddings([text for _, text in items], model, space=store.embedding_space)
+    for (figure, text), embedding in zip(items, embeddings):
+        store.add_item(
+            text=text,
+            embedding=embedding,
+            metadata={
+                "index": len(store.texts),
+                "source": pdf_path,
+                "type": "figure",
+                "page": figure["page"],
+                "pages": figure["pages"],
+                "image_path": figure["path"],
+                "start": None,
+                "end": None,
+            }
+        )
+
+    logger.info("Indexed figures", pdf_path=pdf_path, figures=len(items))
+    return [text for _, text in items]
+
+
+def ingest_pdf_figures(store, pdf_path, question=FIGURE_QUESTION, vision_model="pixtral-12b-2409",
+                       embedding_model=None, max_workers=None):
+    """
+    Extract, summarize and index the figures of a PDF.
+
+    Args:
+        store (SimpleVectorStore): Vector store of the document.
+        pdf_path (str): Path to the PDF file.
+        question (str): Prompt sent with every figure.
+        vision_model (str): Vision model used for the summaries.
+        embedding_model (str, optional): Embedding model, only used when the store has no embedding space yet.
+        max_workers (int, optional): Maximum concurrent vision calls.
+
+    Returns:
+        List[str]: The figure texts that were added to the store.
+    """
+    figures = extract_figures_from_pdf(pdf_path)
+    if not figures:
+        return []
+    summaries = summarize_figures(figures, question, vision_model, max_workers)
+    return index_figures(store, pdf_path, figures, summaries, embedding_model)
@@ -0,0 +1,246 @@
+import argparse
+import time
+
+import numpy as np
+
+from config.settings import settings
+from services.vector_store import make_filter
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _centroids(matrix, order, offsets):
+    """
+    Row-normalised mean vector of each group, the groups being order[offsets[i]:offsets[i + 1]].
+    """
+    sums = np.add.reduceat(matrix[order], offsets[:-1], axis=0) if len(order) else np.zeros((0, matrix.shape[1]))
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (sums / norms).astype(np.float32)
+
+
+class HierarchicalIndex:
+    """
+    Two-stage index over a vector store: documents, then sections, then chunks.
+
+    Each document (metadata "source") and each of its sections gets a centroid embedding. A query
+    first scores the document centroids and keeps the best `top_documents`, then scores the sections
+    of those documents and keeps the best `top_sections`, and finally scores only the chunks inside
+    them. A chunk's section is the outline heading it starts under (metadata "section", set from the
+    PDF outline by process_document), else its page (metadata "page"), else its position in runs of
+    about `section_chars` characters, roughly a page (e.g. news articles).
+    """
+    def __init__(self, store, section_chars=4000):
+        """
+        Build the index.
+
+        Args:
+        store (SimpleVectorStore): Store to index; it must not change while the index is used.
+        section_chars (int): Size of the positional sections used for documents without headings.
+        """
+        self.store = store
+        self.section_chars = section_chars
+        matrix = store._normalized_matrix()
+
+        sections = {}
+        self.section_kinds = {"heading": 0, "page": 0, "position": 0}
+        for document, items in sorted(self._documents(store).items()):
+            for section, indices in self._sections(store, items).items():
+                sections[(document, section)] = indices
+                self.section_kinds[section[0]] += 1
+
+        self.documents = sorted({document for document, _ in sections})
+        document_ids = {document: i for i, document in enumerate(self.documents)}
+        self.section_keys = list(sections)
+        self.section_document = np.array([document_ids[document] for document, _ in self.section_keys], dtype=np.int64)
+
+        # Chunk ids laid out section by section; section i owns order[offsets[i]:offsets[i + 1]]
+        self._order = np.array([i for indices in sections.values() for i in indices], dtype=np.int64)
+        self._offsets = np.zeros(len(sections) + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices in sections.values()], out=self._offsets[1:])
+        self.section_centroids = _centroids(matrix, self._order, self._offsets)
+
+        # Documents own contiguous runs of sections, because sections were added document by document
+        document_offsets = np.searchsorted(self.section_document, np.arange(len(self.documents) + 1))
+        self.document_centroids = _centroids(matrix, self._order, self._offsets[document_offsets])
+
+        logger.info("Built hierarchical index", documents=len(self.documents), sections=len(self.section_keys),
+                    items=len(self._order), **{f"{kind}_sections": n for kind, n in self.section_kinds.items()})
+
+    @staticmethod
+    def _documents(store):
+        documents = {}
+        for i, metadata in enumerate(store.metadata):
+            documents.setdefault(str(metadata.get("source")), []).append(i)
+        return documents
+
+    def _section(self, metadata):
+        """
+        Key of the section a chunk belongs to, prefixed by how it was derived.
+        """
+        if metadata.get("section") is not None:
+            return ("heading", metadata.get("section_start"), metadata["section"])
+        if metadata.get("page") is not None:
+            return ("page", metadata["page"])
+        start = metadata.get("start")
+        return ("position", "unplaced" if start is None else start // self.section_chars)
+
+    def _sections(self, store, items):
+        """
+        Group the chunks of one document into sections, in document order.
+        """
+        items = sorted(items, key=lambda i: (store.metadata[i].get("start") is None,
+                                             store.metadata[i].get("start") or 0, i))
+        sections = {}
+        for i in items:
+            sections.setdefault(self._section(store.metadata[i]), []).append(i)
+        return sections
+
+    def search(self, query_embedding, k=5, top_documents=None, top_sections=None, filter_func=None):
+        """
+        Find the most similar chunks, scoring only those in the best documents and sections.
+
+        Args:
+        query_embedding (List[float]): Query embedding vector.
+        k (int): Number of results to return.
+        top_documents (int, optional): Documents kept after the first stage.
+            Defaults to settings.HIERARCHICAL_TOP_DOCUMENTS.
+        top_sections (int, optional): Sections kept after the second stage.
+            Defaults to settings.HIERARCHICAL_TOP_SECTIONS.
+        filter_func (callable or dict, optional): Function to filter results, or metadata key/value pairs
+            the results must match.
+
+        Returns:
+        List[Dict]: Top k items with their texts, metadata and similarity, as similarity_search.
+        """
+        return self.store._results(*self._search(query_embedding, k, top_documents, top_sections, filter_func))
+
+    def _search(self, query_embedding, k, top_documents=None, top_sections=None, filter_func=None):
+        """
+        Return the ids and similarities of the top k chunks.
+        """
+        top_documents = top_documents or settings.HIERARCHICAL_TOP_DOCUMENTS
+        top_sections = top_sections or settings.HIERARCHICAL_TOP_SECTIONS
+        if not len(self._order):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm:
+            query_vector = query_vector / query_norm
+
+        top_k = self.store._top_k
+        documents = top_k(self.document_centroids @ query_vector, top_documents)
+        candidate_sections = np.flatnonzero(np.isin(self.section_document, documents))
+        sections = candidate_sections[top_k(self.section_centroids[candidate_sections] @ query_vector, top_sections)]
+
+        candidates = np.concatenate([self._order[self._offsets[s]:self._offsets[s + 1]] for s in sections])
+        filter_func = make_filter(filter_func)
+        if filter_func:
+            candidates = np.array([i for i in candidates if filter_func(self.store.metadata[i])], dtype=np.int64)
+            if not len(candidates):
+                return candidates, np.zeros(0, dtype=np.float32)
+        scores = self.store._normalized_matrix()[candidates] @ query_vector
+        top = top_k(scores, k)
+        logger.debug("Hierarchical search", documents=len(documents), sections=len(sections),
+                     scored=len(candidates), items=len(self._order))
+        return candidates[top], scores[top]
+
+
+def benchmark_recall(store, query_embeddings, k=5, top_documents=None, top_sections=None, section_chars=4000):
+    """
+    Compare hierarchical search with the flat scan of the same store.
+
+    Args:
+    store (SimpleVectorStore): Store to search.
+    query_embeddings (List[List[float]]): Query vectors.
+    k (int): Number of results per query.
+    top_documents (int, optional): First-stage fan-out.
+    top_sections (int, optional): Second-stage fan-out.
+    section_chars (int): Size of the positional sections.
+
+    Returns:
+    Dict: Mean recall@k of the hierarchical results against the flat results, and mean latencies.
+    """
+    index = HierarchicalIndex(store, section_chars)
+    recalls, flat_s, hierarchical_s = [], 0.0, 0.0
+    for query_embedding in query_embeddings:
+        start = time.perf_counter()
+        indices, scores = store._candidate_scores(query_embedding)
+        expected = set(indices[store._top_k(scores, k)].tolist())
+        flat_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = set(index._search(query_embedding, k, top_documents, top_sections)[0].tolist())
+        hierarchical_s += time.perf_counter() - start
+
+        recalls.append(len(expected & found) / len(expected) if expected else 1.0)
+
+    queries = max(1, len(query_embeddings))
+    result = {
+        "queries": len(query_embeddings),
+        "k": k,
+        "top_documents": top_documents or settings.HIERARCHICAL_TOP_DOCUMENTS,
+        "top_sections": top_sections or settings.HIERARCHICAL_TOP_SECTIONS,
+        "documents": len(index.documents),
+        "sections": len(index.section_keys),
+        **{f"{kind}_sections": n for kind, n in index.section_kinds.items()},
+        "items": len(store.texts),
+        "recall_at_k": float(np.mean(recalls)) if recalls else 1.0,
+        "flat_ms": flat_s / queries * 1000,
+        "hierarchical_ms": hierarchical_s / queries * 1000,
+    }
+    logger.info("Hierarchical recall benchmark", **result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure hierarchical search recall against flat search.")
+    parser.add_argument("store", help="Directory of a saved SimpleVectorStore, e.g. data/news_index/store, "
+                                      "or a PDF to process first, e.g. data/2407.01219v1.pdf")
+    parser.add_argument("--chunking-strategy", default="fixed", help="Chunking strategy used for a PDF")
+    parser.add_argument("--embedding-provider", default=None, help="Embedding provider used for a PDF")
+    parser.add_argument("--require-headings", action="store_true",
+                        help="Fail unless every document is split into more than one heading-based section")
+    parser.add_argument("--queries", nargs="*", default=None, help="Queries to embed; by default stored chunks are used")
+    parser.add_argument("--sample", type=int, default=100, help="Number of stored chunks used as queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--top-documents", type=int, nargs="+", default=[settings.HIERARCHICAL_TOP_DOCUMENTS])
+    parser.add_argument("--top-sections", type=int, nargs="+", default=[settings.HIERARCHICAL_TOP_SECTIONS])
+    parser.add_argument("--section-chars", type=int, default=4000)
+    args = parser.parse_args()
+
+    if args.store.lower().endswith(".pdf"):
+        from services.document_service import process_document
+        _, store = process_document(args.store, args.chunking_strategy, embedding_provider=args.embedding_provider)
+    else:
+        from services.vector_store import SimpleVectorStore
+        store = SimpleVectorStore.load(args.store)
+    if args.queries:
+        from services.embedding_service import create_embeddings
+        query_embeddings = create_embeddings(args.queries, space=store.embedding_space)
+    else:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(store.vectors), size=min(args.sample, len(store.vectors)), replace=False)
+        query_embeddings = [store.vectors[i] for i in sample]
+
+    index = HierarchicalIndex(store, args.section_chars)
+    print(f"{len(index.documents)} documents, {len(index.section_keys)} sections "
+          f"({', '.join(f'{n} {kind}' for kind, n in index.section_kinds.items())})")
+    if args.require_headings:
+        headings = {document: 0 for document in index.documents}
+        for document, section in index.section_keys:
+            headings[document] += section[0] == "heading"
+        missing = sorted(document for document, n in headings.items() if n <= 1)
+        if missing:
+            parser.error(f"Documents without heading-based sections: {missing}")
+    for top_documents in args.top_documents:
+        for top_sections in args.top_sections:
+            result = benchmark_recall(store, query_embeddings, args.k, top_documents, top_sections, args.section_chars)
+            print(f"documents={top_documents:<4} sections={top_sections:<4} recall@{args.k}={result['recall_at_k']:.3f} "
+                  f"flat={result['flat_ms']:.2f}ms hierarchical={result['hierarchical_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import glob
+import os
+import time
+from urllib.parse import urlsplit
+
+from services.backends import get_backend
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_extractors = []
+
+# Blocks that never contain article text
+_BOILERPLATE_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure")
+
+# Saved Guardian, NYT and generic pages used by the benchmark
+DEFAULT_FIXTURE_DIR = "data/html_fixtures"
+
+
+def register_extractor(*host_suffixes):
+    """
+    Register an article extractor for the given hosts (matched by suffix, e.g. "theguardian.com").
+
+    The extractor is called with the parsed lxml tree and returns the element holding the
+    article body, or None if it cannot find it.
+    """
+    def decorator(extractor):
+        _extractors.append((tuple(host_suffixes), extractor))
+        return extractor
+    return decorator
+
+
+def _class_xpath(tag, class_name):
+    return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+@register_extractor("theguardian.com", "guardian.co.uk")
+def guardian_extractor(tree):
+    matches = tree.xpath(_class_xpath("div", "article-body-commercial-selector"))
+    return matches[0] if matches else None
+
+
+@register_extractor("nytimes.com")
+def nyt_extractor(tree):
+    matches = tree.xpath("//section[@name='articleBody']") or tree.xpath(_class_xpath("section", "meteredContent"))
+    return matches[0] if matches else None
+
+
+def generic_extractor(tree):
+    """
+    Readability-style fallback: pick the element whose direct paragraphs hold the most text.
+    """
+    scores = {}
+    for paragraph in tree.xpath("//p"):
+        parent = paragraph.getparent()
+        if parent is None or any(ancestor.tag in _BOILERPLATE_TAGS for ancestor in paragraph.iterancestors()):
+            continue
+        text_length = len(paragraph.text_content().strip())
+        if text_length >= 25:
+            scores[parent] = scores.get(parent, 0) + text_length
+    if not scores:
+        return None
+    return max(scores.items(), key=lambda item: item[1])[0]
+
+
+def _page_url(tree):
+    canonical = tree.xpath("//link[@rel='canonical']/@href") or tree.xpath("//meta[@property='og:url']/@content")
+    return canonical[0] if canonical else ""
+
+
+def get_extractor(url):
+    """
+    Return the extractor registered for a URL's host, or the generic fallback.
+    """
+    host = urlsplit(url or "").netloc.lower()
+    for host_suffixes, extractor in _extractors:
+        if any(host == suffix or host.endswith("." + suffix) for suffix in host_suffixes):
+            return extractor
+    return generic_extractor
+
+
+def extract_article(html_content, url=None):
+    """
+    Extract the title and the article body of a page.
+
+    The page is parsed once with lxml (C parser) and only the article subtree is selected with
+    XPath; the site is identified from `url`, or from the page's canonical URL.
+
+    Args:
+        html_content (bytes or str): The HTML of the page.
+        url (str, optional): The URL the page was fetched from.
+
+    Returns:
+        Tuple[str, lxml.html.HtmlElement or None]: The page title and the article body element.
+    """
+    lxml_html = get_backend("lxml_html")
+    tree = lxml_html.fromstring(html_content)
+
+    titles = tree.xpath("//title/text()")
+    title = titles[0].strip() if titles else ""
+
+    extractor = get_extractor(url or _page_url(tree))
+    article_body = extractor(tree)
+    if article_body is None and extractor is not generic_extractor:
+        article_body = generic_extractor(tree)
+    return title, article_body
+
+
+def element_to_html(element):
+    """
+    Serialize an lxml element back to HTML.
+    """
+    return get_backend("lxml_html").tostring(element, encoding="unicode")
+
+
+def _baseline_extract(html_content):
+    # The previous implementation: full BeautifulSoup parse with the pure-Python parser
+    soup = get_backend("html_tools")["BeautifulSoup"](html_content, "html.parser")
+    title = soup.find("title")
+    return title.get_text() if title else "", soup.find("div", {"class": "article-body-commercial-selector"})
+
+
+def benchmark_extractors(fixture_dir=DEFAULT_FIXTURE_DIR, repeat=5):
+    """
+    Compare the lxml extractors against the BeautifulSoup baseline over saved HTML pages.
+
+    Args:
+        fixture_dir (str): Directory of saved `.html` pages.
+        repeat (int): Number of passes over the pages.
+
+    Returns:
+        Dict: Number of pages, number of pages whose article body was found, total seconds per
+            implementation and the speed-up.
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    if not pages:
+        raise ValueError(f"No .html fixtures found in {fixture_dir}")
+
+    timings = {}
+    for name, extract in (("beautifulsoup", _baseline_extract), ("lxml", extract_article)):
+        extract(pages[0])  # warm up imports
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page in pages:
+                extract(page)
+        timings[name] = time.perf_counter() - start
+
+    result = {
+        "pages": len(pages),
+        "extracted": sum(extract_article(page)[1] is not None for page in pages),
+        "repeat": repeat,
+        "beautifulsoup_s": timings["beautifulsoup"],
+        "lxml_s": timings["lxml"],
+        "speedup": timings["beautifulsoup"] / timings["lxml"] if timings["lxml"] else float("inf"),
+    }
+    logger.info("HTML extraction benchmark", **result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark article extraction over saved HTML pages.")
+    parser.add_argument("fixture_dir", nargs="?", default=DEFAULT_FIXTURE_DIR,
+                        help=f"Directory of saved .html pages (default: {DEFAULT_FIXTURE_DIR})")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = benchmark_extractors(args.fixture_dir, args.repeat)
+    print(f"{result['pages']} pages ({result['extracted']} bodies found) x {result['repeat']}: "
+          f"BeautifulSoup {result['beautifulsoup_s']:.3f}s, lxml {result['lxml_s']:.3f}s "
+          f"({result['speedup']:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from config.settings import settings
+from research.chunking_strategies import fixed_size_chunking
+from services.data_utils import atomic_write_text
+from services.embedding_providers import get_embedding_provider, parse_space
+from services.embedding_service import create_embeddings
+from services.hierarchical_index import HierarchicalIndex
+from services.vector_store import SimpleVectorStore
+from utils.file_lock import exclusive_file_lock
+from utils.hashing import bytes_sha256
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Guards the references below; the store they point to is never changed once published, so readers
+# can search it without holding the lock
+_lock = threading.RLock()
+# Serialises ingestions in this process, which build the next version of the store off to the side;
+# the file lock in `_ingest_lock_path` serialises them across worker processes
+_ingest_lock = threading.Lock()
+_store = None
+_manifest = None
+# Version of the saved store `_store` was loaded from; another process publishing changes it
+_version = None
+# (store, HierarchicalIndex) pair; an index is only ever used with the snapshot it was built from
+_hierarchy = None
+
+
+def _store_path():
+    return os.path.join(settings.NEWS_INDEX_DIR, "store")
+
+
+def _manifest_path():
+    return os.path.join(settings.NEWS_INDEX_DIR, "manifest.json")
+
+
+def _ingest_lock_path():
+    return os.path.join(settings.NEWS_INDEX_DIR, ".ingest.lock")
+
+
+def _load_index():
+    """
+    Load the persistent news index and its manifest into memory on first use, and again whenever the
+    store's CURRENT pointer shows that another process has saved a new version.
+    """
+    global _store, _manifest, _version
+
+    version = SimpleVectorStore.current_version(_store_path())
+    if _store is None or version != _version:
+        _store = SimpleVectorStore.load(_store_path()) if os.path.exists(_store_path()) else SimpleVectorStore()
+        if os.path.exists(_manifest_path()):
+            with open(_manifest_path(), encoding="utf-8") as f:
+                _manifest = json.load(f)
+        else:
+            _manifest = {}
+        _version = version
+    return _store, _manifest
+
+
+def get_news_store():
+    """
+    Return the current snapshot of the news vector store, loading it from disk if needed.
+
+    The snapshot must not be modified; ingestion replaces it with a new store instead.
+    """
+    with _lock:
+        return _load_index()[0]
+
+
+def _needs_refit(store, changed_ids, new_chunks):
+    """
+    Whether a local model's fit has drifted too far from the index: more than
+    settings.NEWS_LOCAL_REFIT_RATIO of the chunks after the update would not be part of its training corpus.
+    """
+    kept = [metadata for metadata in store.metadata if metadata.get("article_id") not in changed_ids]
+    # Chunks indexed before fits were tracked were all part of the fit
+    unfitted = sum(not metadata.get("in_fit", True) for metadata in kept) + new_chunks
+    total = len(kept) + new_chunks
+    return total > 0 and unfitted / total > settings.NEWS_LOCAL_REFIT_RATIO
+
+
+def ingest_news_articles(articles, chunk_size=1000, chunk_overlap=200, model=None, provider=None, rebuild=False):
+    """
+    Add new or changed articles to the persistent news index.
+
+    Articles are identified by the stable id derived from their URL. Articles whose content hash is
+    already in the manifest are skipped; changed articles have their old chunks replaced. Articles
+    without content (failed fetches) are never indexed, so they are retried on the next refresh. All
+    new chunks are embedded in a single batch.
+
+    With a provider fitted per corpus (local-lsa), new chunks are embedded with the index's current
+    fit. The model is only refitted on the whole index, and every chunk re-embedded, on a rebuild,
+    when the fit is no longer available, or when the chunks outside its training corpus exceed
+    settings.NEWS_LOCAL_REFIT_RATIO of the index. Superseded fits are kept until no saved version
+    of the index uses them.
+
+    The update is applied to a copy of the store, which is swapped in once saved: searches never see
+    a partial update, and a failed ingestion leaves the index and the manifest unchanged. Ingestions
+    are serialised across processes with a file lock, and start from the latest saved version.
+
+    Args:
+        articles (List[Dict]): Articles as returned by save_news_data.
+        chunk_size (int): Size of each chunk in characters.
+        chunk_overlap (int): Overlap between chunks in characters.
+        model (str, optional): Embedding model. Defaults to the provider's default model.
+        provider (str, optional): Embedding provider. Defaults to settings.EMBEDDING_PROVIDER.
+        rebuild (bool): Refit a local embedding model on the whole index even if it has not drifted.
+
+    Returns:
+        Dict: Number of new, changed, skipped and empty articles, of chunks added, and whether the
+            local embedding model was refitted.
+    """
+    stats = {"new": 0, "changed": 0, "skipped": 0, "empty": 0, "chunks_added": 0, "refit": False}
+    embedder = get_embedding_provider(provider, model)
+    with _ingest_lock, exclusive_file_lock(_ingest_lock_path()):
+        with _lock:
+            # Another worker may have saved a new version while this one waited for the lock
+            store, manifest = _load_index()
+        if store.embedding_space and parse_space(store.embedding_space) != (embedder.name, embedder.model):
+            # Fail before touching the index rather than mixing embedding spaces in it
+            raise ValueError(f"Embedding space mismatch: the news index holds {store.embedding_space} vectors, "
+                             f"got {embedder.name}:{embedder.model}")
+
+        pending, changed_ids = [], set()
+        for article in articles:
+            article_id = article["document_id"]
+            if not (article.get("content") or "").strip():
+                stats["empty"] += 1
+                continue
+            content_hash = bytes_sha256(article["content"].encode("utf-8"))
+            previous = manifest.get(article_id)
+            if previous and previous["content_hash"] == content_hash:
+                stats["skipped"] += 1
+                continue
+            if previous:
+                changed_ids.add(article_id)
+                stats["changed"] += 1
+            else:
+                stats["new"] += 1
+            pending.append((article, content_hash))
+
+        if not pending and not (rebuild and embedder.requires_fit and store.texts):
+            logger.info("News index is up to date", **stats)
+            return stats
+
+        chunks, chunk_metadata = [], []
+        ingested_at = datetime.now().isoformat(timespec="seconds")
+        step = chunk_size - chunk_overlap
+        for article, _ in pending:
+            text = f"{article['title']}\n\n{article['content']}"
+            for i, chunk in enumerate(fixed_size_chunking(text, chunk_size, chunk_overlap)):
+                chunks.append(chunk)
+                chunk_metadata.append({
+                    "article_id": article["document_id"],
+                    "source": article["url"],
+                    "news_source": article.get("source"),
+                    "title": article["title"],
+                    "date": article.get("fetched_at", ingested_at),
+                    "chunk": i,
+                    "start": i * step,
+                    "end": i * step + len(chunk),
+                })
+
+        # Everything that can fail is done before the update is applied to a new copy of the index
+        embedding_space = store.embedding_space if store.texts else None
+        if embedder.requires_fit and (rebuild or not embedder.has_space(embedding_space)
+                                      or _needs_refit(store, changed_ids, len(chunks))):
+            # Refit the local model on every chunk kept and added, and re-embed them all in the new space
+            kept = [i for i, metadata in enumerate(store.metadata) if metadata.get("article_id") not in changed_ids]
+            texts = [store.texts[i] for i in kept] + chunks
+            # New dicts: the published snapshot shares its metadata with the copies
+            metadata_list = [{**metadata, "in_fit": True} for metadata in [store.metadata[i] for i in kept] + chunk_metadata]
+            embedding_space = embedder.fit(texts)
+            embeddings = create_embeddings(texts, space=embedding_space)
+            updated_store = SimpleVectorStore(embedding_space)
+            stats["refit"] = True
+        else:
+            embedding_space = embedding_space or embedder.space
+            if embedder.requires_fit:
+                # Embedded with the current fit, but not part of its training corpus
+                chunk_metadata = [{**metadata, "in_fit": False} for metadata in chunk_metadata]
+            texts, metadata_list = chunks, chunk_metadata
+            embeddings = create_embeddings(chunks, space=embedding_space) if chunks else []
+            updated_store = store.copy()
+            updated_store.remove_items(lambda metadata: metadata.get("article_id") in changed_ids)
+        for text, embedding, metadata in zip(texts, embeddings, metadata_list):
+            updated_store.add_item(text=text, embedding=embedding, metadata=metadata, embedding_space=embedding_space)
+
+        updated_manifest = dict(manifest)
+        for article, content_hash in pending:
+            updated_manifest[article["document_id"]] = {
+                "url": article["url"],
+                "title": article["title"],
+                "source": article.get("source"),
+                "content_hash": content_hash,
+                "ingested_at": ingested_at,
+            }
+
+        hierarchy = _build_hierarchy(updated_store)
+
+        retired_spaces = updated_store.save(_store_path())
+        atomic_write_text(_manifest_path(), json.dumps(updated_manifest, indent=2))
+        _publish(updated_store, updated_manifest, hierarchy, SimpleVectorStore.current_version(_store_path()))
+        for space in retired_spaces:
+            # No saved version of the index uses this fit any more
+            get_embedding_provider(*parse_space(space)).discard(space)
+        stats["chunks_added"] = len(chunks)
+        logger.info("News index updated", **stats)
+        return stats
+
+
+def _publish(store, manifest, hierarchy=None, version=None):
+    """
+    Make a new version of the index visible to readers, together with its two-stage index.
+    """
+    global _store, _manifest, _hierarchy, _version
+    with _lock:
+        _store, _manifest, _version = store, manifest, version
+        _hierarchy = (store, hierarchy) if hierarchy is not None else None
+
+
+def _build_hierarchy(store):
+    """
+    Build the two-stage index of a store snapshot, or return None while it is small enough for a flat scan.
+    """
+    if len(store.texts) < settings.HIERARCHICAL_MIN_ITEMS:
+        return None
+    return HierarchicalIndex(store)
+
+
+def _get_hierarchy(store):
+    """
+    Return the two-stage index built from exactly this snapshot of the news store, building it on
+    first use (e.g. after a restart), or None while the store is small enough for a flat scan.
+    """
+    global _hierarchy
+    with _lock:
+        if _hierarchy is not None and _hierarchy[0] is store:
+            return _hierarchy[1]
+    # Snapshots are immutable, so the index can be built without holding the lock
+    hierarchy = _build_hierarchy(store)
+    with _lock:
+        if hierarchy is not None and _store is store:
+            _hierarchy = (store, hierarchy)
+    return hierarchy
+
+
+def refresh_news(guardian_queries=None, nyt_sections=None, rebuild=False):
+    """
+    Fetch the configured news feeds and ingest only what changed since the last refresh.
+
+    Args:
+        guardian_queries (List[str], optional): Guardian search queries. Defaults to settings.
+        nyt_sections (List[str], optional): NYT top-stories sections. Defaults to settings.
+        rebuild (bool): Refit a local embedding model on the whole index, see ingest_news_articles.
+
+    Returns:
+        Dict: Ingestion statistics summed over all feeds.
+    """
+    from integration.fetch_news import fetch_guardian_data, fetch_nyt_data
+
+    guardian_queries = settings.NEWS_GUARDIAN_QUERIES if guardian_queries is None else guardian_queries
+    nyt_sections = settings.NEWS_NYT_SECTIONS if nyt_sections is None else nyt_sections
+
+    articles = []
+    for query in guardian_queries:
+        articles.extend(fetch_guardian_data(query) or [])
+    for section in nyt_sections:
+        articles.extend(fetch_nyt_data(section) or [])
+
+    # The same article can be returned by several feeds
+    unique_articles = list({article["document_id"]: article for article in articles}.values())
+    return ingest_news_articles(unique_articles, rebuild=rebuild)
+
+
+def search_news(query, k=5):
+    """
+    Search the news index.
+
+    Args:
+        query (str): Search query.
+        k (int): Number of results to return.
+
+    Returns:
+        List[Dict]: Top k chunks with their texts, metadata and similarity.
+    """
+    with _lock:
+        store = _load_index()[0]
+    if not store.texts:
+        return []
+    hierarchy = _get_hierarchy(store)
+    query_embedding = create_embeddings(query, space=store.embedding_space)
+    # Large indexes only score the chunks of the articles and sections closest to the query
+    if hierarchy is not None:
+        return hierarchy.search(query_embedding, k)
+    return store.similarity_search(query_embedding, k=k)
+
+
+class NewsRefreshScheduler:
+    """
+    Runs `refresh_news` periodically on a background thread.
+    """
+    def __init__(self, interval_seconds=None, guardian_queries=None, nyt_sections=None):
+        self.interval_seconds = interval_seconds or settings.NEWS_REFRESH_SECONDS
+        self.guardian_queries = guardian_queries
+        self.nyt_sections = nyt_sections
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start refreshing in the background; the first refresh runs immediately.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="news-refresh", daemon=True)
+        self._thread.start()
+        logger.info("News refresh scheduler started", interval_seconds=self.interval_seconds)
+
+    def stop(self, timeout=None):
+        """
+        Stop the scheduler, waiting for a running refresh to finish.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                refresh_news(self.guardian_queries, self.nyt_sections)
+            except Exception as e:
+                logger.error("News refresh failed", error=str(e))
+            self._stop.wait(self.interval_seconds)
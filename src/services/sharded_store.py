@@ -0,0 +1,148 @@
+import heapq
+import json
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import numpy as np
+
+from config.settings import settings
+from services.shared_index import MappedVectorStore
+from services.vector_store import MetadataFilter, SimpleVectorStore, make_filter  # noqa: F401 (MetadataFilter re-exported)
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Per search process: version directory -> (mapped vectors, metadata or None)
+_shard_sources = {}
+
+
+def get_search_pool():
+    """
+    Return the shared pool of search processes, started on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.SEARCH_PROCESSES or os.cpu_count() or 1
+            # Spawned rather than forked: the parent runs threads (uvicorn, executors) that fork would copy mid-flight
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info("Started search processes", workers=workers)
+        return _pool
+
+
+def shutdown_search_pool():
+    """
+    Stop the search processes, if they were started.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _open_shard_source(path, with_metadata):
+    vectors, metadata = _shard_sources.get(path, (None, None))
+    if vectors is None:
+        if len(_shard_sources) >= 32:
+            # Forget the least recently opened version; superseded versions are never searched again
+            _shard_sources.pop(next(iter(_shard_sources)))
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    if with_metadata and metadata is None:
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            metadata = json.load(f)["metadata"]
+    _shard_sources[path] = (vectors, metadata)
+    return vectors, metadata
+
+
+def _search_shard(path, start, end, query_vector, k, filter_func=None):
+    """
+    Return the local top k (global index, similarity) pairs of rows [start, end) of a published index.
+
+    Runs in a search process, which maps the index files itself; only the query and the k results
+    cross the process boundary.
+    """
+    vectors, metadata = _open_shard_source(path, filter_func is not None)
+    scores = vectors[start:end] @ query_vector
+    positions = np.arange(end - start)
+    if filter_func is not None:
+        positions = np.flatnonzero([filter_func(item) for item in metadata[start:end]])
+        scores = scores[positions]
+    top = SimpleVectorStore._top_k(scores, k)
+    return list(zip((start + positions[top]).tolist(), scores[top].tolist()))
+
+
+class ShardedVectorStore(MappedVectorStore):
+    """
+    Published index whose similarity search is scattered over a pool of processes.
+
+    The rows are split into contiguous shards, one per search process; each process scans its shard
+    of the memory-mapped vectors and returns its local top k, and the results are merged with a heap.
+    Indexes smaller than settings.SEARCH_SHARD_MIN_ITEMS per shard are searched in-process, where
+    the round trip to the pool would cost more than the scan.
+    """
+    def _shard_bounds(self):
+        workers = settings.SEARCH_PROCESSES or os.cpu_count() or 1
+        num_shards = max(1, min(workers, len(self.texts) // max(1, settings.SEARCH_SHARD_MIN_ITEMS)))
+        edges = np.linspace(0, len(self.texts), num_shards + 1).astype(int)
+        return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+    def similarity_search(self, query_embedding, k=5, filter_func=None, embedding_space=None):
+        """
+        Find the most similar items to a query embedding.
+
+        Args:
+        query_embedding (List[float]): Query embedding vector.
+        k (int): Number of results to return.
+        filter_func (callable or dict, optional): Function to filter results, or metadata key/value
+            pairs the results must match. Functions must be picklable (e.g. defined at module level)
+            to be run in the search processes; other functions are applied in-process.
+        embedding_space (str, optional): Embedding space of the query, checked against the store's.
+
+        Returns:
+        List[Dict]: Top k most similar items with their texts and metadata.
+        """
+        self.check_embedding_space(embedding_space)
+        filter_func = make_filter(filter_func)
+
+        shards = self._shard_bounds()
+        if len(shards) == 1 or not self._picklable(filter_func):
+            return super().similarity_search(query_embedding, k, filter_func)
+
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm:
+            query_vector = query_vector / query_norm
+
+        pool = get_search_pool()
+        futures = [pool.submit(_search_shard, self.path, start, end, query_vector, k, filter_func)
+                   for start, end in shards]
+        try:
+            shard_results = [future.result() for future in futures]
+        except FileNotFoundError:
+            # The version was removed by a later publish before a search process mapped it; this
+            # process still maps it, so search it here rather than mixing in another version's rows
+            logger.warning("Shared index version removed, searching in-process", path=self.path)
+            return super().similarity_search(query_embedding, k, filter_func)
+        merged = heapq.nlargest(k, chain.from_iterable(shard_results), key=lambda item: item[1])
+        logger.info("Sharded similarity search", shards=len(shards), k=k, results=len(merged))
+        return self._results([index for index, _ in merged], [score for _, score in merged])
+
+    @staticmethod
+    def _picklable(filter_func):
+        if filter_func is None:
+            return True
+        try:
+            pickle.dumps(filter_func)
+            return True
+        except (pickle.PicklingError, AttributeError, TypeError):
+            logger.debug("Filter cannot be sent to the search processes, searching in-process",
+                         filter_func=repr(filter_func))
+            return False
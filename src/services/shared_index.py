@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from config.settings import settings
+from services.vector_store import SimpleVectorStore
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_CURRENT = "CURRENT"
+
+_readers_lock = threading.Lock()
+_readers = {}  # (index key, store class) -> (version, store)
+
+
+class MappedTexts(Sequence):
+    """
+    Read-only list of strings decoded on access from a memory-mapped UTF-8 blob.
+    """
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("text index out of range")
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+
+class MappedVectorStore(SimpleVectorStore):
+    """
+    Read-only vector store over a published index version.
+
+    The vectors and texts are memory-mapped, so every worker process that opens the same version
+    shares one copy of them through the page cache instead of holding its own.
+    """
+    def __init__(self, path):
+        """
+        Open a published index version.
+
+        Args:
+        path (str): Version directory written by `publish_index`.
+        """
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            items = json.load(f)
+        super().__init__(items["embedding_space"])
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        # Vectors are published row-normalised, so they are searched without a private copy
+        self._matrix = self.vectors
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(path, "texts.bin")
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else np.zeros(0, np.uint8)
+        self.texts = MappedTexts(blob, offsets)
+        self.metadata = items["metadata"]
+
+    def add_item(self, text, embedding, metadata=None, embedding_space=None):
+        raise RuntimeError("Published indexes are read-only; publish a new version instead")
+
+    def remove_items(self, filter_func):
+        raise RuntimeError("Published indexes are read-only; publish a new version instead")
+
+    def _normalized_matrix(self):
+        return self._matrix
+
+
+def _index_dir(key):
+    return os.path.join(settings.SHARED_INDEX_DIR, key)
+
+
+def _current_version(key):
+    try:
+        with open(os.path.join(_index_dir(key), _CURRENT), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_index(key, store):
+    """
+    Publish a vector store as the new version of a shared index.
+
+    The version is written to its own directory and then made current by atomically replacing the
+    CURRENT pointer, so readers only ever see complete versions. Older versions beyond
+    settings.SHARED_INDEX_KEEP_VERSIONS are removed; readers that still map them keep working.
+
+    Args:
+    key (str): Identifier of the index.
+    store (SimpleVectorStore): Store to publish.
+
+    Returns:
+    str: The new version.
+    """
+    index_dir = _index_dir(key)
+    os.makedirs(index_dir, exist_ok=True)
+    version = f"{time.time_ns()}-{os.getpid()}"
+    tmp_dir = tempfile.mkdtemp(dir=index_dir, prefix=".tmp-")
+
+    vectors = store._normalized_matrix() if len(store.vectors) else np.zeros((0, 0), dtype=np.float32)
+    np.save(os.path.join(tmp_dir, "vectors.npy"), np.ascontiguousarray(vectors, dtype=np.float32))
+    encoded = [text.encode("utf-8") for text in store.texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "texts.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump({"embedding_space": store.embedding_space, "metadata": list(store.metadata)}, f)
+    os.replace(tmp_dir, os.path.join(index_dir, version))
+
+    pointer = os.path.join(index_dir, f".{_CURRENT}-{version}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(index_dir, _CURRENT))
+
+    versions = sorted(name for name in os.listdir(index_dir) if not name.startswith(".") and name != _CURRENT)
+    # The version just published is always kept, whatever the setting
+    keep = max(1, settings.SHARED_INDEX_KEEP_VERSIONS)
+    for old_version in versions[:max(0, len(versions) - keep)]:
+        shutil.rmtree(os.path.join(index_dir, old_version), ignore_errors=True)
+
+    logger.info("Published shared index", key=key, version=version, items=len(encoded))
+    return version
+
+
+def open_shared_index(key, store_class=MappedVectorStore):
+    """
+    Return the current version of a shared index, memory-mapped.
+
+    The CURRENT pointer is checked on every call; when a writer has published a new version the
+    reader swaps to it, otherwise the already mapped store is returned.
+
+    Args:
+    key (str): Identifier of the index.
+    store_class (type): MappedVectorStore or a subclass of it, e.g. ShardedVectorStore.
+
+    Returns:
+    MappedVectorStore or None: The current version, or None if nothing was published yet.
+    """
+    version = _current_version(key)
+    if version is None:
+        return None
+    with _readers_lock:
+        cached = _readers.get((key, store_class))
+        if cached and cached[0] == version:
+            return cached[1]
+        try:
+            store = store_class(os.path.join(_index_dir(key), version))
+        except FileNotFoundError:
+            # The version was replaced and removed between reading CURRENT and opening it
+            logger.warning("Shared index version disappeared", key=key, version=version)
+            return cached[1] if cached else None
+        _readers[(key, store_class)] = (version, store)
+    logger.info("Opened shared index", key=key, version=version, items=len(store.texts))
+    return store
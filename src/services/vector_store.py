@@ -1,25 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
 import numpy as np
-from dotenv import load_dotenv
 from utils.logger_config import setup_logger
 
 logger = setup_logger(__name__)
-load_dotenv()
+
+# Name of the pointer file holding the current version of a saved store
+_CURRENT = "CURRENT"
+# Versions kept by `save`: the current one and the one before it, for readers still loading it
+_KEEP_VERSIONS = 2
+
+
+class MetadataFilter:
+    """
+    Picklable filter matching items whose metadata contains all the given key/value pairs.
+    """
+    def __init__(self, **conditions):
+        self.conditions = conditions
+
+    def __call__(self, metadata):
+        return all(metadata.get(key) == value for key, value in self.conditions.items())
+
+    def __repr__(self):
+        return f"MetadataFilter({self.conditions})"
+
+
+def make_filter(filter_func):
+    """
+    Return a search filter as a callable: metadata dicts become a MetadataFilter, anything else is
+    returned unchanged.
+    """
+    if isinstance(filter_func, dict):
+        return MetadataFilter(**filter_func)
+    return filter_func
 
 
 class SimpleVectorStore:
     """
     A simple vector store implementation using NumPy.
     """
-    def __init__(self):
+    def __init__(self, embedding_space=None):
         """
         Initialize the vector store.
+
+        Args:
+        embedding_space (str, optional): Embedding space of the vectors, e.g. "openai:text-embedding-3-small".
+            Taken from the first item added when not given.
         """
+        self.embedding_space = embedding_space
         self.vectors = []  # List to store embedding vectors
         self.texts = []  # List to store original texts
         self.metadata = []  # List to store metadata for each text
+        self._matrix = None  # Row-normalised float32 matrix of the vectors, built on first search
         logger.info("Initialized SimpleVectorStore with empty vectors, texts, and metadata.")
 
-    def add_item(self, text, embedding, metadata=None):
+    def check_embedding_space(self, embedding_space):
+        """
+        Raise ValueError if vectors from `embedding_space` cannot be compared with the store's vectors.
+
+        Args:
+        embedding_space (str or None): Embedding space of the incoming vectors; None skips the check.
+        """
+        if embedding_space and self.embedding_space and embedding_space != self.embedding_space:
+            raise ValueError(f"Embedding space mismatch: the store holds {self.embedding_space} vectors, "
+                             f"got {embedding_space}")
+
+    def add_item(self, text, embedding, metadata=None, embedding_space=None):
         """
         Add an item to the vector store.
 
@@ -27,56 +77,291 @@ class SimpleVectorStore:
         text (str): The original text.
         embedding (List[float]): The embedding vector.
         metadata (dict, optional): Additional metadata.
+        embedding_space (str, optional): Embedding space of the vector, checked against the store's.
         """
+        self.check_embedding_space(embedding_space)
+        self.embedding_space = self.embedding_space or embedding_space
         self.vectors.append(np.array(embedding))  # Convert embedding to numpy array and add to vectors list
         self.texts.append(text)  # Add the original text to texts list
         self.metadata.append(metadata or {})  # Add metadata to metadata list, default to empty dict if None
+        self._matrix = None
         #logger.info(f"Added item to vector store - embedding_length={len(embedding)}, metadata={metadata}.")
 
-    def similarity_search(self, query_embedding, k=5, filter_func=None):
+    def remove_items(self, filter_func):
+        """
+        Remove every item whose metadata matches a predicate.
+
+        Args:
+        filter_func (callable): Function called with an item's metadata, returning True to remove it.
+
+        Returns:
+        int: Number of removed items.
+        """
+        keep = [i for i, metadata in enumerate(self.metadata) if not filter_func(metadata)]
+        removed = len(self.metadata) - len(keep)
+        self.vectors = [self.vectors[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self._matrix = None
+        return removed
+
+    def copy(self):
+        """
+        Return a new store holding the same items, which can be changed without affecting this one.
+
+        Returns:
+        SimpleVectorStore: The copy; vectors and metadata dicts are shared, not duplicated.
+        """
+        store = SimpleVectorStore(self.embedding_space)
+        store.vectors = list(self.vectors)
+        store.texts = list(self.texts)
+        store.metadata = list(self.metadata)
+        return store
+
+    def save(self, path):
+        """
+        Persist the vector store as a new version inside a directory.
+
+        The version is written to its own subdirectory and then made current by atomically replacing
+        the directory's CURRENT pointer, as shared_index.publish_index does, so `path` always holds a
+        complete store. The previous version is kept for readers that are still loading it; older
+        ones are removed.
+
+        Args:
+        path (str): Directory to write the vectors, texts and metadata to.
+
+        Returns:
+        Set[str]: Embedding spaces used only by the removed versions, whose models (e.g. local fits)
+            can now be discarded.
+        """
+        os.makedirs(path, exist_ok=True)
+        version = f"{time.time_ns()}-{os.getpid()}"
+        tmp_dir = tempfile.mkdtemp(dir=path, prefix=".tmp-")
+        vectors = np.array(self.vectors, dtype=np.float32) if len(self.vectors) else np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+        with open(os.path.join(tmp_dir, "items.json"), "w", encoding="utf-8") as f:
+            json.dump({"texts": self.texts, "metadata": self.metadata, "embedding_space": self.embedding_space}, f)
+        # Small summary read when versions are pruned, without parsing every text
+        with open(os.path.join(tmp_dir, "store.json"), "w", encoding="utf-8") as f:
+            json.dump({"embedding_space": self.embedding_space, "items": len(self.texts)}, f)
+        os.replace(tmp_dir, os.path.join(path, version))
+
+        pointer = os.path.join(path, f".{_CURRENT}-{version}")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(path, _CURRENT))
+
+        versions = sorted(name for name in os.listdir(path)
+                          if os.path.isdir(os.path.join(path, name)) and not name.startswith("."))
+        removed = versions[:max(0, len(versions) - _KEEP_VERSIONS)]
+        removed_spaces = {self._saved_space(os.path.join(path, old_version)) for old_version in removed}
+        kept_spaces = {self._saved_space(os.path.join(path, kept)) for kept in versions[len(removed):]}
+        for old_version in removed:
+            shutil.rmtree(os.path.join(path, old_version), ignore_errors=True)
+        for legacy_file in ("vectors.npy", "items.json"):
+            # Left by stores saved before they were versioned; `load` follows CURRENT from now on
+            if os.path.exists(os.path.join(path, legacy_file)):
+                os.remove(os.path.join(path, legacy_file))
+        logger.info("Saved vector store", path=path, version=version, items=len(self.texts))
+        return removed_spaces - kept_spaces - {None}
+
+    @staticmethod
+    def _saved_space(version_dir):
+        summary_path = os.path.join(version_dir, "store.json")
+        if not os.path.exists(summary_path):
+            # Versions saved before the summary existed
+            summary_path = os.path.join(version_dir, "items.json")
+        try:
+            with open(summary_path, encoding="utf-8") as f:
+                return json.load(f).get("embedding_space")
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the current version of a vector store written by `save`.
+
+        Directories written before stores were versioned (files directly in `path`) are still read.
+
+        Args:
+        path (str): Directory the store was saved to.
+
+        Returns:
+        SimpleVectorStore: The loaded store.
+        """
+        for _ in range(3):
+            version_dir = cls._current_dir(path)
+            try:
+                vectors = np.load(os.path.join(version_dir, "vectors.npy"))
+                with open(os.path.join(version_dir, "items.json"), encoding="utf-8") as f:
+                    items = json.load(f)
+                break
+            except FileNotFoundError:
+                # A concurrent save replaced and removed the version between reading CURRENT and opening it
+                if cls._current_dir(path) == version_dir:
+                    raise
+                logger.warning("Vector store version disappeared, reading CURRENT again", path=version_dir)
+        else:
+            raise FileNotFoundError(f"No complete vector store version in {path}")
+        store = cls(items.get("embedding_space"))
+        store.vectors = list(vectors)
+        store.texts = items["texts"]
+        store.metadata = items["metadata"]
+        logger.info("Loaded vector store", path=version_dir, items=len(store.texts))
+        return store
+
+    @staticmethod
+    def current_version(path):
+        """
+        Return the version a directory's CURRENT pointer names, or None if it has none (nothing saved
+        yet, or a store saved before versioning). Cheap enough to check before every read.
+        """
+        try:
+            with open(os.path.join(path, _CURRENT), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def _current_dir(cls, path):
+        version = cls.current_version(path)
+        return os.path.join(path, version) if version else path
+
+    def _normalized_matrix(self):
+        """
+        Return the vectors as a row-normalised float32 matrix, rebuilding it after changes.
+        """
+        if self._matrix is None:
+            matrix = np.asarray(self.vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._matrix = matrix / norms
+        return self._matrix
+
+    def _candidate_scores(self, query_embedding, filter_func=None):
+        """
+        Compute the cosine similarity of the query to every item that passes the filter.
+
+        Args:
+        query_embedding (List[float]): Query embedding vector.
+        filter_func (callable or dict, optional): Function to filter items, or metadata key/value pairs
+            the items must match.
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: Item indices and their similarities.
+        """
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm:
+            query_vector = query_vector / query_norm
+
+        matrix = self._normalized_matrix()
+        filter_func = make_filter(filter_func)
+        if filter_func:
+            indices = np.array([i for i, metadata in enumerate(self.metadata) if filter_func(metadata)], dtype=np.int64)
+            return indices, matrix[indices] @ query_vector if len(indices) else np.zeros(0, dtype=np.float32)
+        return np.arange(len(self.vectors)), matrix @ query_vector
+
+    @staticmethod
+    def _top_k(scores, k):
+        """
+        Return the positions of the k highest scores, best first.
+        """
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _results(self, indices, scores):
+        return [
+            {
+                "text": self.texts[idx],
+                "metadata": self.metadata[idx],
+                "similarity": float(score)
+            }
+            for idx, score in zip(indices, scores)
+        ]
+
+    def similarity_search(self, query_embedding, k=5, filter_func=None, embedding_space=None):
         """
         Find the most similar items to a query embedding.
 
         Args:
         query_embedding (List[float]): Query embedding vector.
         k (int): Number of results to return.
-        filter_func (callable, optional): Function to filter results.
+        filter_func (callable or dict, optional): Function to filter results, or metadata key/value pairs
+            the results must match.
+        embedding_space (str, optional): Embedding space of the query, checked against the store's.
 
         Returns:
         List[Dict]: Top k most similar items with their texts and metadata.
         """
-        if not self.vectors:
+        self.check_embedding_space(embedding_space)
+        if not len(self.vectors):
             logger.info("Similarity search called, but vector store is empty.")
             return []
 
         logger.info(f"Performing similarity search with query_embedding of length {len(query_embedding)} and k={k}.")
-        
-        query_vector = np.array(query_embedding)
-        
-        similarities = []
-        for i, vector in enumerate(self.vectors):
-            # Apply filter if provided
-            if filter_func and not filter_func(self.metadata[i]):
-                #logger.info(f"Item at index {i} filtered out by filter_func.")
-                continue
-                
-            # Calculate cosine similarity
-            similarity = np.dot(query_vector, vector) / (np.linalg.norm(query_vector) * np.linalg.norm(vector))
-            similarities.append((i, similarity)) 
-            #logger.info(f"Calculated similarity for index {i}: {similarity:.4f}")
-
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        logger.info(f"Sorted similarities: {similarities[:k]}")
-
-        results = []
-        for i in range(min(k, len(similarities))):
-            idx, score = similarities[i]
-            results.append({
-                "text": self.texts[idx],
-                "metadata": self.metadata[idx], 
-                "similarity": score 
-            })
-            #logger.info(f"Top result {i + 1}: text='{self.texts[idx][:30]}...', similarity={score:.4f}, metadata={self.metadata[idx]}")
 
+        indices, scores = self._candidate_scores(query_embedding, filter_func)
+        top = self._top_k(scores, k)
+        logger.debug("Sorted similarities", top_similarities=list(zip(indices[top].tolist(), scores[top].tolist())))
+
+        results = self._results(indices[top], scores[top])
         logger.info(f"Returning top {len(results)} results from similarity search.")
-        return results 
\ No newline at end of file
+        return results
+
+    def max_marginal_relevance_search(self, query_embedding, k=5, fetch_k=20, lambda_mult=0.5, filter_func=None,
+                                      embedding_space=None):
+        """
+        Find items that are relevant to the query but not redundant with each other.
+
+        The `fetch_k` most similar items are re-ranked with maximal marginal relevance: each step picks
+        the candidate maximising `lambda_mult * sim(query, item) - (1 - lambda_mult) * max sim(item, selected)`.
+        Candidate-to-candidate similarities are computed once as a single matrix product, and the
+        redundancy term is updated incrementally.
+
+        Args:
+        query_embedding (List[float]): Query embedding vector.
+        k (int): Number of results to return.
+        fetch_k (int): Number of most similar candidates to re-rank.
+        lambda_mult (float): Trade-off between relevance (1.0) and diversity (0.0).
+        filter_func (callable or dict, optional): Function to filter results, or metadata key/value pairs
+            the results must match.
+        embedding_space (str, optional): Embedding space of the query, checked against the store's.
+
+        Returns:
+        List[Dict]: Up to k items in selection order with their texts, metadata and query similarity.
+        """
+        self.check_embedding_space(embedding_space)
+        if not len(self.vectors):
+            logger.info("MMR search called, but vector store is empty.")
+            return []
+        if k <= 0:
+            return []
+
+        indices, scores = self._candidate_scores(query_embedding, filter_func)
+        top = self._top_k(scores, max(k, fetch_k))
+        if len(top) == 0:
+            return []
+        candidates, relevance = indices[top], scores[top]
+
+        candidate_matrix = self._normalized_matrix()[candidates]
+        pairwise = candidate_matrix @ candidate_matrix.T
+
+        selected = [0]  # The most relevant candidate is always picked first
+        max_redundancy = pairwise[0].copy()
+        available = np.ones(len(candidates), dtype=bool)
+        available[0] = False
+        for _ in range(min(k, len(candidates)) - 1):
+            mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * max_redundancy
+            mmr_scores[~available] = -np.inf
+            best = int(np.argmax(mmr_scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_redundancy, pairwise[best], out=max_redundancy)
+
+        logger.info("Returning MMR results", k=len(selected), fetch_k=len(candidates), lambda_mult=lambda_mult)
+        return self._results(candidates[selected], relevance[selected])
@@ -0,0 +1,46 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import endpoints
+
+CONTEXT_STATS = {
+    "tokens_before": 120,
+    "tokens_after": 80,
+    "tokens_saved": 40,
+    "merged_chunks": 1,
+    "dropped_duplicates": 0,
+    "dropped_over_budget": 0,
+}
+
+
+def _fake_search(method):
+    def search(pdf_path, chunking_strategy, test_queries, **kwargs):
+        return {
+            "results": [
+                {"query": query, method: {"documents": [], "response": f"answer {i}", "context": dict(CONTEXT_STATS)}}
+                for i, query in enumerate(test_queries)
+            ],
+            "evaluation": None,
+        }
+    return search
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(endpoints, "similarity_search", _fake_search("standard_retrieval"))
+    monkeypatch.setattr(endpoints, "hybrid_search", _fake_search("hybrid_search"))
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("search_type", ["standard", "hybrid"])
+def test_chat_returns_context_packing_stats(client, search_type):
+    response = client.post("/chat", json={"question": ["What is RAG?", "What is chunking?"],
+                                          "search_type": search_type, "file_path": "data/paper.pdf"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["response"] for result in results] == ["answer 0", "answer 1"]
+    assert all(result["context"] == CONTEXT_STATS for result in results)
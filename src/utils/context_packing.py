@@ -0,0 +1,168 @@
+import re
+from functools import lru_cache
+
+from config.settings import settings
+from services.backends import get_backend
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    tiktoken = get_backend("tiktoken")
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The tokenizer files are downloaded on first use, which fails in offline environments
+        logger.warning("Tokenizer unavailable, estimating token counts from characters", model=model, error=str(e))
+        return None
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Count the tokens of a text with the tokenizer of the given model.
+
+    Args:
+        text (str): Text to count.
+        model (str): Model whose tokenizer is used.
+
+    Returns:
+        int: Number of tokens.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def merge_overlapping_chunks(results):
+    """
+    Merge retrieved chunks that overlap or touch in their source document.
+
+    Chunks need `source`, `start` and `end` metadata to be merged, and their text must span exactly
+    those offsets; other chunks (without offsets, or whose whitespace was normalised by the chunking
+    strategy) are kept as they are. A merged passage takes the best (lowest) relevance rank of its parts.
+
+    Args:
+        results (List[Dict]): Retrieved documents in relevance order, each with a "text" key and
+            optional "metadata".
+
+    Returns:
+        Tuple[List[Dict], int]: Passages with "text" and "rank" keys in relevance order, and the
+            number of chunks that were merged into another one.
+    """
+    passages = []
+    by_source = {}
+    for rank, result in enumerate(results):
+        metadata = result.get("metadata") or {}
+        start, end = metadata.get("start"), metadata.get("end")
+        # Overlaps are cut by character offsets, which only works when the text matches its span
+        if start is None or end is None or len(result["text"]) != end - start:
+            passages.append({"text": result["text"], "rank": rank})
+        else:
+            by_source.setdefault(metadata.get("source"), []).append(
+                {"text": result["text"], "rank": rank, "start": start, "end": end})
+
+    merged_count = 0
+    for spans in by_source.values():
+        spans.sort(key=lambda span: span["start"])
+        current = dict(spans[0])
+        for span in spans[1:]:
+            if span["start"] <= current["end"]:
+                if span["end"] > current["end"]:
+                    current["text"] += span["text"][current["end"] - span["start"]:]
+                    current["end"] = span["end"]
+                current["rank"] = min(current["rank"], span["rank"])
+                merged_count += 1
+            else:
+                passages.append(current)
+                current = dict(span)
+        passages.append(current)
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages, merged_count
+
+
+def _word_set(text):
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
+def drop_near_duplicates(passages, threshold=None):
+    """
+    Drop passages whose words are almost all contained in a more relevant passage.
+
+    Args:
+        passages (List[Dict]): Passages in relevance order.
+        threshold (float, optional): Jaccard similarity above which a passage is a near-duplicate.
+            Defaults to settings.CONTEXT_DUPLICATE_THRESHOLD.
+
+    Returns:
+        Tuple[List[Dict], int]: The remaining passages and the number dropped.
+    """
+    threshold = settings.CONTEXT_DUPLICATE_THRESHOLD if threshold is None else threshold
+    kept, kept_words = [], []
+    for passage in passages:
+        words = _word_set(passage["text"])
+        is_duplicate = any(
+            len(words & other) / (len(words | other) or 1) >= threshold
+            for other in kept_words
+        )
+        if not is_duplicate:
+            kept.append(passage)
+            kept_words.append(words)
+    return kept, len(passages) - len(kept)
+
+
+def pack_context(results, token_budget=None, model="gpt-3.5-turbo"):
+    """
+    Assemble the context for a prompt from retrieved documents.
+
+    Overlapping or adjacent chunks are merged by their source offsets, near-duplicates are dropped
+    and passages are added in relevance order until the token budget is filled.
+
+    Args:
+        results (List[Dict]): Retrieved documents in relevance order, each with a "text" key.
+        token_budget (int, optional): Maximum number of context tokens. Defaults to
+            settings.CONTEXT_TOKEN_BUDGET; 0 disables the budget.
+        model (str): Model whose tokenizer is used for counting.
+
+    Returns:
+        Tuple[str, Dict]: The packed context and statistics about the tokens saved.
+    """
+    token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    passages, merged = merge_overlapping_chunks(results)
+    passages, duplicates = drop_near_duplicates(passages)
+
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR, model)
+    selected, used_tokens, over_budget = [], 0, 0
+    for passage in passages:
+        tokens = count_tokens(passage["text"], model) + (separator_tokens if selected else 0)
+        if token_budget and used_tokens + tokens > token_budget:
+            # A lower-ranked, shorter passage may still fit
+            over_budget += 1
+            continue
+        selected.append(passage["text"])
+        used_tokens += tokens
+
+    context = CONTEXT_SEPARATOR.join(selected)
+    # Both counts are taken on the joined strings, so the saving is not skewed by tokens merging
+    # across passage boundaries
+    tokens_before = count_tokens(CONTEXT_SEPARATOR.join(r["text"] for r in results), model)
+    tokens_after = count_tokens(context, model)
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "merged_chunks": merged,
+        "dropped_duplicates": duplicates,
+        "dropped_over_budget": over_budget,
+    }
+    logger.info("Context packed", **stats)
+    return context, stats
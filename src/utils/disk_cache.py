@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def make_cache_key(*parts):
+    """
+    Build a stable cache key from JSON-serialisable parts.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    A small persistent key-value cache backed by SQLite, safe to share between threads and processes.
+    """
+    def __init__(self, path):
+        """
+        Open (or create) the cache.
+
+        Args:
+        path (str): Path to the SQLite database file.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for a key, or `default` if it is missing.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        """
+        Store a JSON-serialisable value under a key.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
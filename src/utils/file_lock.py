@@ -0,0 +1,26 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks of the callers apply
+    fcntl = None
+
+
+@contextmanager
+def exclusive_file_lock(path):
+    """
+    Hold an exclusive advisory lock on `path` (created if missing), shared by every process on the host.
+
+    Args:
+        path (str): Lock file path.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
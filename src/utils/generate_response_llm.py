@@ -1,13 +1,24 @@
-from dotenv import load_dotenv
+from services.backends import get_backend
+from utils.context_packing import pack_context
 from utils.logger_config import setup_logger
-from config.settings import settings
+from utils.single_flight import SingleFlight
 
 logger = setup_logger(__name__)
 
-load_dotenv()
-client = settings.openai_client
+_completions = SingleFlight("chat_completions")
 
-def generate_response(query, results, query_type, model="gpt-3.5-turbo"):
+def _complete(model, system_prompt, user_prompt):
+    response = get_backend("openai_client").chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.2
+    )
+    return response.choices[0].message.content
+
+def generate_response(query, results, query_type, model="gpt-3.5-turbo", token_budget=None, context_stats=None):
     """
     Generate a response based on query, retrieved documents, and query type.
     
@@ -16,11 +27,16 @@ def generate_response(query, results, query_type, model="gpt-3.5-turbo"):
         results (List[Dict]): Retrieved documents
         query_type (str): Type of query
         model (str): LLM model
+        token_budget (int, optional): Maximum number of context tokens, see pack_context
+        context_stats (dict, optional): Collects the statistics of pack_context: tokens before and
+            after packing, chunks merged and passages dropped
         
     Returns:
         str: Generated response
     """
-    context = "\n\n---\n\n".join([r["text"] for r in results])
+    context, stats = pack_context(results, token_budget, model)
+    if context_stats is not None:
+        context_stats.update(stats)
     system_prompt = """You are a helpful assistant. Answer the question based on the provided context. If you cannot answer from the context, acknowledge the limitations."""
     
     user_prompt = f"""
@@ -32,13 +48,5 @@ def generate_response(query, results, query_type, model="gpt-3.5-turbo"):
     Please provide a helpful response based on the context.
     """
     
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.2
-    )
-    
-    return response.choices[0].message.content
\ No newline at end of file
+    # Identical concurrent prompts share one completion
+    return _completions.do((model, system_prompt, user_prompt), _complete, model, system_prompt, user_prompt)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import hashlib
+import os
+from functools import lru_cache
+
+
+def bytes_sha256(data):
+    """
+    Return the SHA-256 hex digest of a byte string.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def url_id(url):
+    """
+    Return a short stable identifier for a URL.
+    """
+    return hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=1024)
+def _file_sha256(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """
+    Return the SHA-256 hex digest of a file's content.
+
+    Digests are memoised on (path, size, modification time), so unchanged files are only read once.
+    """
+    stat = os.stat(path)
+    return _file_sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,81 @@
+import argparse
+import re
+import subprocess
+import sys
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import_time(module="main", python=sys.executable, cwd=None):
+    """
+    Measure how long a module takes to import in a fresh interpreter using `python -X importtime`.
+
+    Args:
+        module (str): Module to import.
+        python (str): Interpreter to run.
+        cwd (str, optional): Working directory for the subprocess (the `src` directory).
+
+    Returns:
+        Dict: Total cumulative import time in milliseconds and per-module cumulative times,
+              sorted from slowest to fastest.
+    """
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative_us, indent, name = match.groups()
+            modules.append({"module": name, "cumulative_ms": int(cumulative_us) / 1000, "depth": len(indent) // 2})
+
+    total_ms = next((m["cumulative_ms"] for m in reversed(modules) if m["module"] == module), 0.0)
+    modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+    return {"module": module, "total_ms": total_ms, "modules": modules}
+
+
+def check_import_budget(module="main", budget_ms=1500.0, forbidden=(), cwd=None):
+    """
+    Check that importing a module stays within a time budget and does not pull in heavy backends.
+
+    Args:
+        module (str): Module to import.
+        budget_ms (float): Maximum allowed cumulative import time in milliseconds.
+        forbidden (Iterable[str]): Top-level packages that must not be imported eagerly.
+        cwd (str, optional): Working directory for the subprocess.
+
+    Returns:
+        Tuple[bool, Dict]: Whether the budget was met and the measurement it was based on.
+    """
+    measurement = measure_import_time(module, cwd=cwd)
+    imported = {m["module"].split(".")[0] for m in measurement["modules"]}
+    measurement["forbidden_imported"] = sorted(set(forbidden) & imported)
+    ok = measurement["total_ms"] <= budget_ms and not measurement["forbidden_imported"]
+    return ok, measurement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget of a module.")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--forbid", nargs="*", default=["langchain", "faiss", "chromadb", "mistralai", "fitz"])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    ok, measurement = check_import_budget(args.module, args.budget_ms, args.forbid)
+    print(f"import {args.module}: {measurement['total_ms']:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    for entry in measurement["modules"][:args.top]:
+        print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+    if measurement["forbidden_imported"]:
+        print(f"Eagerly imported heavy backends: {', '.join(measurement['forbidden_imported'])}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
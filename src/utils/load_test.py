@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+DEFAULT_DOCUMENT = "data/2305.15334v1.pdf"
+
+
+def parse_server_timing(header):
+    """
+    Parse a Server-Timing header into stage durations in milliseconds.
+    """
+    timings = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+def summarize_latencies(latencies, elapsed_s, errors, stage_timings):
+    """
+    Summarize a load-test run.
+
+    Args:
+        latencies (List[float]): Request latencies in seconds.
+        elapsed_s (float): Wall-clock duration of the run.
+        errors (int): Number of failed requests.
+        stage_timings (List[Dict]): Per-request stage durations in milliseconds.
+
+    Returns:
+        Dict: Throughput, latency percentiles (ms) and mean per-stage durations (ms).
+    """
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    stages = {}
+    for timings in stage_timings:
+        for stage, duration in timings.items():
+            stages.setdefault(stage, []).append(duration)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed_s if elapsed_s else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "stages_mean_ms": {stage: float(np.mean(values)) for stage, values in stages.items()},
+    }
+
+
+async def _drive(client, make_request, concurrency, total_requests):
+    """
+    Send `total_requests` requests with at most `concurrency` in flight.
+    """
+    latencies, stage_timings, errors = [], [], 0
+    remaining = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                failed = response.status_code >= 400
+                stage_timings.append(parse_server_timing(response.headers.get("server-timing")))
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize_latencies(latencies, time.perf_counter() - started, errors, stage_timings)
+
+
+async def run_load_test(concurrency_levels=(1, 4, 16), requests_per_level=32, document=DEFAULT_DOCUMENT,
+                        questions=None, chunking_strategy="fixed", search_type="standard", target_url=None):
+    """
+    Drive /upload_file and /chat at fixed concurrency levels.
+
+    Args:
+        concurrency_levels (List[int]): Numbers of concurrent clients to measure.
+        requests_per_level (int): Requests sent to each endpoint per concurrency level.
+        document (str): PDF uploaded and queried.
+        questions (List[str], optional): Questions sent with every /chat request.
+        chunking_strategy (str): Chunking strategy used by /chat.
+        search_type (str): Search type used by /chat.
+        target_url (str, optional): URL of a running service. By default the app is served in-process.
+
+    Returns:
+        List[Dict]: One summary per (endpoint, concurrency level).
+    """
+    import httpx
+
+    if target_url:
+        client = httpx.AsyncClient(base_url=target_url, timeout=None)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                   timeout=None)
+
+    with open(document, "rb") as f:
+        pdf_bytes = f.read()
+    file_name = os.path.basename(document)
+
+    async def upload(client):
+        return await client.post("/upload_file", files={"file": (file_name, pdf_bytes, "application/pdf")})
+
+    payload = {
+        "question": questions or ["What is the main topic of the document?"],
+        "chunking_strategy": chunking_strategy,
+        "search_type": search_type,
+        "file_path": f"data/{file_name}",
+    }
+
+    async def chat(client):
+        return await client.post("/chat", json=payload)
+
+    reports = []
+    async with client:
+        # Make sure the document exists on the server before /chat is measured
+        (await upload(client)).raise_for_status()
+        for concurrency in concurrency_levels:
+            for endpoint, make_request in (("/upload_file", upload), ("/chat", chat)):
+                summary = await _drive(client, make_request, concurrency, requests_per_level)
+                reports.append({"endpoint": endpoint, "concurrency": concurrency, **summary})
+    return reports
+
+
+def format_report(reports):
+    """
+    Render load-test summaries as a plain-text table.
+    """
+    lines = [f"{'endpoint':<14}{'conc':>6}{'reqs':>6}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  stages (mean ms)"]
+    for report in reports:
+        stages = ", ".join(f"{stage}={duration:.1f}" for stage, duration in report["stages_mean_ms"].items())
+        lines.append(
+            f"{report['endpoint']:<14}{report['concurrency']:>6}{report['requests']:>6}{report['errors']:>6}"
+            f"{report['throughput_rps']:>9.2f}{report['p50_ms']:>10.1f}{report['p95_ms']:>10.1f}"
+            f"{report['p99_ms']:>10.1f}  {stages}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /upload_file and /chat without network access.")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--document", default=DEFAULT_DOCUMENT)
+    parser.add_argument("--questions", nargs="+", default=None)
+    parser.add_argument("--chunking-strategy", default="fixed")
+    parser.add_argument("--search-type", default="standard")
+    parser.add_argument("--target-url", default=None, help="Running service to test instead of the in-process app")
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=400.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="Write the summaries to this JSON file")
+    args = parser.parse_args()
+
+    if not args.target_url:
+        # The stand-in services must be configured before the app (and its settings) are imported
+        from integration.fake_services import FakeMistral, start_fake_openai_server
+
+        base_url, server = start_fake_openai_server(
+            embedding_latency_ms=args.embedding_latency_ms,
+            chat_latency_ms=args.chat_latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+        )
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "offline")
+        os.environ["USE_FAKE_MISTRAL"] = "true"
+        os.environ.setdefault("MISTRAL_API_KEY", "offline")
+        FakeMistral.configure(jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+
+        from config.settings import Settings
+        Settings.OPENAI_BASE_URL = base_url
+        Settings.OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
+        Settings.USE_FAKE_MISTRAL = True
+
+    reports = asyncio.run(run_load_test(
+        concurrency_levels=args.concurrency,
+        requests_per_level=args.requests,
+        document=args.document,
+        questions=args.questions,
+        chunking_strategy=args.chunking_strategy,
+        search_type=args.search_type,
+        target_url=args.target_url,
+    ))
+    print(format_report(reports))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,184 @@
+import atexit
+import itertools
 import logging
-import structlog
+import logging.handlers
+import queue
 import sys
+import threading
 
-def setup_logger(name=None):
+import structlog
+
+from config.settings import settings
+
+_configure_lock = threading.Lock()
+_configured = False
+_queue_listener = None
+_sample_counters = {}
+
+
+# Tracebacks and stack traces rendered by format_exc_info / StackInfoRenderer, always logged in full
+_UNTRUNCATED_KEYS = ("exception", "stack")
+
+
+def truncate_large_fields(logger, method_name, event_dict):
+    """
+    Shorten oversized values so large payloads (embeddings, documents, base64 data) stay out of the logs.
+    """
+    max_length = settings.LOG_MAX_FIELD_LENGTH
+    if max_length <= 0:
+        return event_dict
+
+    for key, value in event_dict.items():
+        if key in _UNTRUNCATED_KEYS:
+            continue
+        if isinstance(value, (str, bytes)):
+            text = value
+        elif isinstance(value, (list, tuple, dict, set)):
+            text = repr(value)
+        else:
+            continue
+        if len(text) > max_length:
+            event_dict[key] = f"{text[:max_length]}... <truncated {len(text) - max_length} chars>"
+    return event_dict
+
+
+def sample_per_item_events(logger, method_name, event_dict):
+    """
+    Keep only one in every N events logged with `sampled=True`.
+
+    Per-item messages (one line per chunk, sentence or document) are marked with `sampled=True`;
+    warnings and errors are never dropped.
+    """
+    if not event_dict.pop("sampled", False):
+        return event_dict
+    if method_name in ("warning", "error", "exception", "critical"):
+        return event_dict
+
+    rate = settings.LOG_SAMPLE_RATE
+    if rate >= 1:
+        return event_dict
+    if rate <= 0:
+        raise structlog.DropEvent
+
+    every = max(1, round(1 / rate))
+    counter = _sample_counters.setdefault(event_dict.get("event"), itertools.count())
+    if next(counter) % every:
+        raise structlog.DropEvent
+    return event_dict
+
+
+def _start_queue_listener(level):
+    """
+    Route standard logging through a queue so the calling thread never blocks on stream I/O.
+    """
+    global _queue_listener
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _queue_listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+    _queue_listener.start()
+
+
+def _stop_queue_listener():
+    """
+    Flush and stop the queue listener, if one is running.
+    """
+    global _queue_listener
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
+
+
+def configure_logging(profile=None, level=None, force=False):
     """
-    Configure structlog to integrate with standard logging and apply custom settings.
+    Configure structlog and standard logging once for the whole process.
+
+    Args:
+        profile (str, optional): "development" (console output, callsite info) or "production"
+            (JSON output, queue-based handler). Defaults to settings.LOG_PROFILE.
+        level (str, optional): Log level name. Defaults to settings.LOG_LEVEL.
+        force (bool): Reconfigure even if logging was already configured.
     """
-    # Basic configuration for the standard logging module
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=logging.INFO,
-    )
+    global _configured
 
-    # Configure structlog to work with standard logging
-    structlog.configure(
-        processors=[
+    with _configure_lock:
+        if _configured and not force:
+            return
+
+        profile = (profile or settings.LOG_PROFILE).lower()
+        level = logging.getLevelName((level or settings.LOG_LEVEL).upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+
+        processors = [
             structlog.stdlib.filter_by_level,
+            sample_per_item_events,
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
             structlog.processors.TimeStamper(fmt="ISO"),
             structlog.processors.StackInfoRenderer(),
-            structlog.processors.CallsiteParameterAdder(
-                [
-                    structlog.processors.CallsiteParameter.FILENAME,
-                    structlog.processors.CallsiteParameter.FUNC_NAME,
-                    structlog.processors.CallsiteParameter.LINENO,
-                    structlog.processors.CallsiteParameter.MODULE,
-                ]
-            ),
-            structlog.processors.format_exc_info,
-            structlog.dev.ConsoleRenderer(),  # Human-readable output
-        ],
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        context_class=dict,
-        cache_logger_on_first_use=True,
-    )
+        ]
+
+        # Inspecting frames on every line is expensive, so callsite info is only added when debugging
+        if level <= logging.DEBUG:
+            processors.append(
+                structlog.processors.CallsiteParameterAdder(
+                    [
+                        structlog.processors.CallsiteParameter.FILENAME,
+                        structlog.processors.CallsiteParameter.FUNC_NAME,
+                        structlog.processors.CallsiteParameter.LINENO,
+                        structlog.processors.CallsiteParameter.MODULE,
+                    ]
+                )
+            )
+
+        processors.append(structlog.processors.format_exc_info)
+
+        _stop_queue_listener()
+
+        if profile == "production":
+            processors.append(truncate_large_fields)
+            processors.append(structlog.processors.JSONRenderer())
+            _start_queue_listener(level)
+        else:
+            processors.append(structlog.dev.ConsoleRenderer())  # Human-readable output
+            # Basic configuration for the standard logging module
+            logging.basicConfig(
+                format="%(message)s",
+                stream=sys.stdout,
+                level=level,
+                force=force,
+            )
+
+        structlog.configure(
+            processors=processors,
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            context_class=dict,
+            cache_logger_on_first_use=True,
+        )
+        _configured = True
+
+
+def setup_logger(name=None):
+    """
+    Return a structlog logger, configuring logging for the process on first use.
+    """
+    configure_logging()
 
     # Obtain a structlog-based logger
     logger = structlog.get_logger(name)
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import Future
+
+from utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is in flight wait for it
+    and receive the same result (or exception). Nothing is cached: once the call finishes, the next
+    caller for the key runs the function again.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)`, or wait for the identical call already in flight.
+
+        Args:
+        key (Hashable): Identifies calls that can share a result.
+        func (callable): Function to run.
+
+        Returns:
+        Any: The function's result, shared by every coalesced caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+
+        if not leader:
+            logger.debug("Joined in-flight call", single_flight=self.name, sampled=True)
+            return call.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,57 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Stage durations of the HTTP request being handled, reported in the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings():
+    """
+    Start collecting stage durations for the current request.
+
+    Returns:
+        dict: The dictionary stage durations are recorded into.
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings):
+    """
+    Format stage durations as a Server-Timing header value.
+
+    Args:
+        timings (dict): Stage durations in seconds.
+
+    Returns:
+        str: Header value, e.g. "retrieve;dur=1.2, generate;dur=350.0".
+    """
+    return ", ".join(
+        f"{stage.removesuffix('_s')};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+    )
+
+
+@contextmanager
+def timed(timings, stage):
+    """
+    Record the wall-clock duration of a block in seconds.
+
+    The duration is also added to the timings of the current HTTP request, if any.
+
+    Args:
+        timings (dict, optional): Dictionary the duration is accumulated into.
+        stage (str): Key under which the duration is recorded.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        targets = [timings] if timings is not None else []
+        request_timings = _request_timings.get()
+        if request_timings is not None and request_timings is not timings:
+            targets.append(request_timings)
+        for target in targets:
+            target[stage] = target.get(stage, 0.0) + elapsed